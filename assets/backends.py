@@ -0,0 +1,494 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+from assets.dispatcher import Dispatcher
+from assets.gazetteer import evaluate_locally, load_gazetteer
+from assets.telemetry import TELEMETRY
+
+# --- PROMPTS ---
+
+# System message shared by the round and fun facts requests
+ROUND_SYSTEM_MESSAGE = "You are a fact and geography expert and provide the requested data accurately and you don't favor popular capitals over others. The probability is even across all capitals. You do not reveal the name nor the country of the guess capital in the fun facts; you only reveal them in their appropriate field, which is guess_capital name and guess_capital country."
+
+EVALUATION_SYSTEM_MESSAGE = "You are a geography and distance expert that evaluates accurately if the user guess is a real city,  a capital, and how far is it from the  capital."
+
+# Asks for exactly one round as a JSON object (round fallback, see utils.fetch_capitals_batch)
+SINGLE_ROUND_PROMPT = """
+    Provide a JSON object with the following details about two random capitals, 1 target capital, and 1 capital to be guessed:
+    - Name of the target_capital + its country.
+    - Name of the guess_capital + name of its country (you are allowed to mention the name of the capital and its country in this field)
+    - 4 fun facts about the guess_capital where you do not mention the guess_capital's name nor its country's name in this manner:
+        - 1. flight time between them in one sentence WITHOUT mentioning the guess capital's name nor its country. 
+        - 2. How many people live in it in one sentence WITHOUT mentioning the guess capital's name nor its country. 
+        - 3. When it was founded WITHOUT mentioning the guess capital's name nor its country.
+        - 4. Famous dish of the guess_capital WITHOUT mentioning the guess capital's name nor its country. 
+    - Distance between the two capitals in kilometers
+
+    Example:
+    {
+        "target_capital": {"name": "Tunis", "country": "Tunisia"},
+        "guess_capital": {"name": "Rome", "country": "Italy", "fun_facts": ["it would take you x hours to fly there.", "20 million people live there.", "it was founded in 1580.", "It is famous for its couscous."]},
+        "distance_km": 5837
+    }
+    """
+
+# Asks for `count` rounds as a JSON array (round fallback, formatted with str.format)
+BATCH_ROUND_PROMPT = """
+    Provide a JSON array of {count} objects. Each object describes one round of the game with two random capitals, 1 target capital, and 1 capital to be guessed:
+    - Name of the target_capital + its country.
+    - Name of the guess_capital + name of its country (you are allowed to mention the name of the capital and its country in this field)
+    - 4 fun facts about the guess_capital where you do not mention the guess_capital's name nor its country's name: flight time between them, how many people live in it, when it was founded, and its famous dish, one sentence each.
+    - Distance between the two capitals in kilometers
+    Use a different guess_capital in every object. Answer with the JSON array only.
+
+    Example of one object:
+    {{
+        "target_capital": {{"name": "Tunis", "country": "Tunisia"}},
+        "guess_capital": {{"name": "Rome", "country": "Italy", "fun_facts": ["it would take you x hours to fly there.", "20 million people live there.", "it was founded in 1580.", "It is famous for its couscous."]}},
+        "distance_km": 5837
+    }}
+    """
+
+# Asks for fun facts about one capital, used as hints for precomputed rounds (formatted with str.format)
+FUN_FACTS_PROMPT = """
+    Provide a JSON object with 3 fun facts about {name} ({country}), one sentence each, that do not mention the city's name nor its country's name:
+    - 1. How many people live in it.
+    - 2. When it was founded.
+    - 3. Its famous dish.
+
+    Example:
+    {{"fun_facts": ["20 million people live there.", "it was founded in 1580.", "It is famous for its couscous."]}}
+    """
+
+# Evaluates a guess the gazetteer could not resolve (formatted with str.format)
+EVALUATION_PROMPT = """
+Reference City: {reference_city}
+Correct City: {correct_city}
+User Guess: {user_guess}
+
+Evaluate the user's guess following these instructions:
+- Normalize input for comparison: Treat New York the same as new york the same as NEW YORK etc. Uppercase and lowercase dont matter. 
+- Does the guess match the target_capital? 
+- Is the guess a capital of a country?
+- Is the guess an existing recognized city? 
+- If the city does not exist, return null.
+- If the city is a valid city (existing), then calculate the distance in kilometers from the target_city to the city the user guessed.
+- Give your comment on how well the player has been guessing, taking into account these criteria and your short feedback.
+- Never tell in which country the city is!
+- Provide the output in this JSON format:
+{{
+    "guess_correct": <true/false>,
+    "is_capital": <true/false>,
+    "valid_city": <true/false>,
+    "distance_to_guess": <distance or null>
+    "comment": "<string>"
+}}
+- Use 'null' for missing or inapplicable values for 'distance_to_guess'.
+- The 'comment' field should always be a string, even if empty (e.g., "").
+- All boolean values must be explicitly true or false.
+- When checking if a city is a capital, refer to its official status globally. And also, the capitalization of the letters do not play a role, for example, berlin is a capital, as well as Berlin. That holds true for cities as well. And if the given input provided can either be a capital city, non-capital city, an object, a name etc then check if it holds true in this order.
+- If input is not a city than do not count the distance off
+- If the user sends and input which is not a valid string (empty input, digits, emojis etc) - tell them that it is not correct and they said something funny and count it as a wrong guess"
+"""
+
+# --- PRICING ---
+
+# USD per million (prompt, completion) tokens, used for the cost counter; unknown models count as free
+MODEL_PRICES = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+}
+
+# --- SCHEMAS ---
+
+def is_valid_round(data):
+    """
+    Check that a round (from the catalog or the model) has every field the game reads.
+
+    Args:
+        data: Parsed model output (or an error string).
+
+    Returns:
+        bool: True if the round can be played.
+    """
+    if not isinstance(data, dict):
+        return False
+    target = data.get("target_capital")
+    guess = data.get("guess_capital")
+    if not isinstance(target, dict) or not isinstance(guess, dict):
+        return False
+    if not all(isinstance(city.get(key), str) and city.get(key) for city in (target, guess) for key in ("name", "country")):
+        return False
+    fun_facts = guess.get("fun_facts")
+    if not isinstance(fun_facts, list) or not all(isinstance(fact, str) for fact in fun_facts):
+        return False
+    return isinstance(data.get("distance_km"), (int, float)) and not isinstance(data.get("distance_km"), bool)
+
+
+def is_valid_evaluation(data):
+    """
+    Check that a model evaluation has every field record_guess reads, with the right types.
+
+    Args:
+        data: Parsed model output.
+
+    Returns:
+        bool: True if the evaluation can be recorded (and cached).
+    """
+    if not isinstance(data, dict):
+        return False
+    if not all(isinstance(data.get(key), bool) for key in ("guess_correct", "is_capital", "valid_city")):
+        return False
+    return isinstance(data.get("comment"), str)
+
+
+def parse_fun_facts(content):
+    """
+    Parse a fun facts response into a list of strings (empty if malformed).
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return []
+    if isinstance(data, dict):
+        data = data.get("fun_facts")
+    if not isinstance(data, list):
+        return []
+    return [fact for fact in data if isinstance(fact, str) and fact]
+
+
+def parse_round_batch(content):
+    """
+    Parse a batched round response, keeping only the entries that pass is_valid_round.
+
+    Args:
+        content (str): Raw model output; either a JSON array or an object wrapping one.
+
+    Returns:
+        list: The valid rounds.
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return []
+    if isinstance(data, dict):
+        data = next((value for value in data.values() if isinstance(value, list)), [data])
+    if not isinstance(data, list):
+        return []
+    return [entry for entry in data if is_valid_round(entry)]
+
+
+def request_key(method, *args):
+    """
+    Stable identity of a backend request, used for recordings and request coalescing.
+    """
+    return hashlib.sha256(json.dumps([method, *args], sort_keys=True).encode("utf-8")).hexdigest()
+
+
+# --- BACKENDS ---
+
+class LLMBackend:
+    """
+    Interface behind the round fallback, the hint store and evaluate_guess.
+
+    fetch_rounds returns a list of complete rounds (only used when the round
+    catalog cannot be loaded),
+    fetch_fun_facts returns hint sentences about one capital and evaluate
+    returns a dict in the evaluate_guess format. stream_evaluation
+    yields the raw evaluation JSON in chunks as it is generated. All of them may
+    raise; the callers in assets.utils turn exceptions into the game's error values.
+    """
+
+    def fetch_rounds(self, count):
+        raise NotImplementedError
+
+    def fetch_fun_facts(self, name, country):
+        raise NotImplementedError
+
+    def evaluate(self, city_details, user_guess):
+        raise NotImplementedError
+
+    def stream_evaluation(self, city_details, user_guess):
+        # Backends without native streaming deliver the whole answer as one chunk
+        yield json.dumps(self.evaluate(city_details, user_guess))
+
+
+class OpenAIBackend(LLMBackend):
+    """
+    Backend calling the OpenAI chat completions API.
+
+    A single client (and therefore a single keep-alive connection pool) is created
+    per backend instance and reused for every request, with explicit timeouts.
+    Every request goes through the backend's Dispatcher, which rate-limits and
+    bounds concurrency across all sessions, coalesces identical evaluations and
+    retries transient failures with jittered backoff; the SDK's own retries are
+    turned off so attempts are not multiplied.
+    """
+
+    def __init__(self, api_key, model="gpt-3.5-turbo", timeout=20.0, connect_timeout=5.0, max_retries=3, dispatch=None):
+        """
+        Args:
+            dispatch (dict): Dispatcher settings (rate_per_second, burst,
+                max_concurrency, max_wait, ...), e.g. from a [backend.dispatch] section.
+        """
+        # Imported here so the offline backends work without the OpenAI SDK configured
+        import openai
+
+        self.model = model
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            timeout=openai.Timeout(timeout, connect=connect_timeout),
+            max_retries=0,
+            http_client=openai.DefaultHttpxClient(),
+        )
+        self.dispatcher = Dispatcher(
+            max_retries=max_retries,
+            is_retryable=lambda error: isinstance(error, (
+                openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError,
+            )),
+            is_rate_limit=lambda error: isinstance(error, openai.RateLimitError),
+            **dict(dispatch or {}),
+        )
+        TELEMETRY.register_source("openai_dispatcher", self.dispatcher.metrics)
+
+    @staticmethod
+    def _messages(system_message, prompt):
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt},
+        ]
+
+    def _complete(self, system_message, prompt, temperature, coalesce=False):
+        # Only deterministic requests are coalesced; identical round requests must stay independent
+        key = request_key("complete", system_message, prompt, temperature) if coalesce else None
+        return self.dispatcher.call(self._create, system_message, prompt, temperature, key=key)
+
+    def _create(self, system_message, prompt, temperature):
+        with TELEMETRY.span("openai.completion"):
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=self._messages(system_message, prompt),
+                temperature=temperature,
+            )
+        self._record_usage(response.usage)
+        # Extract the response content
+        return response.choices[0].message.content.strip()
+
+    def _record_usage(self, usage):
+        # Token and cost counters from the response's usage block
+        if usage is None:
+            return
+        prompt_price, completion_price = MODEL_PRICES.get(self.model, (0.0, 0.0))
+        TELEMETRY.count("openai.requests")
+        TELEMETRY.count("openai.prompt_tokens", usage.prompt_tokens)
+        TELEMETRY.count("openai.completion_tokens", usage.completion_tokens)
+        TELEMETRY.count("openai.cost_usd", (usage.prompt_tokens * prompt_price + usage.completion_tokens * completion_price) / 1e6)
+
+    def fetch_rounds(self, count):
+        if count == 1:
+            return parse_round_batch(self._complete(ROUND_SYSTEM_MESSAGE, SINGLE_ROUND_PROMPT, 1.2))
+        prompt = BATCH_ROUND_PROMPT.format(count=count)
+        return parse_round_batch(self._complete(ROUND_SYSTEM_MESSAGE, prompt, 1.2))
+
+    def fetch_fun_facts(self, name, country):
+        prompt = FUN_FACTS_PROMPT.format(name=name, country=country)
+        return parse_fun_facts(self._complete(ROUND_SYSTEM_MESSAGE, prompt, 0.7, coalesce=True))
+
+    def _evaluation_prompt(self, city_details, user_guess):
+        return EVALUATION_PROMPT.format(
+            reference_city=city_details['target_capital']['name'],
+            correct_city=city_details['guess_capital']['name'],
+            user_guess=user_guess,
+        )
+
+    def evaluate(self, city_details, user_guess):
+        # Low temperature for deterministic responses
+        return json.loads(self._complete(EVALUATION_SYSTEM_MESSAGE, self._evaluation_prompt(city_details, user_guess), 0.2, coalesce=True))
+
+    def stream_evaluation(self, city_details, user_guess):
+        prompt = self._evaluation_prompt(city_details, user_guess)
+        key = request_key("stream", EVALUATION_SYSTEM_MESSAGE, prompt)
+        yield from self.dispatcher.stream(self._stream, prompt, key=key)
+
+    def _stream(self, prompt):
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._messages(EVALUATION_SYSTEM_MESSAGE, prompt),
+            temperature=0.2,
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+            # The last chunk carries the usage of the whole completion
+            if getattr(chunk, "usage", None) is not None:
+                self._record_usage(chunk.usage)
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic offline backend driven by the gazetteer.
+
+    Rounds pair two random capitals with their real haversine distance and neutral
+    hints; evaluations come straight from the gazetteer. `latency` seconds are
+    slept on every call to simulate a remote model.
+    """
+
+    def __init__(self, seed=0, latency=0.0):
+        self.latency = float(latency)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _wait(self):
+        if self.latency > 0:
+            time.sleep(self.latency)
+
+    def fetch_rounds(self, count):
+        self._wait()
+        with self._lock:
+            gazetteer = load_gazetteer()
+            capitals = [i for i in range(len(gazetteer)) if gazetteer.is_capital[i]]
+            return [self._make_round(gazetteer, *self._random.sample(capitals, 2)) for _ in range(count)]
+
+    def fetch_fun_facts(self, name, country):
+        self._wait()
+        gazetteer = load_gazetteer()
+        i = gazetteer.lookup(name, country)
+        if i is None:
+            return []
+        return self._fun_facts(gazetteer, i)
+
+    @staticmethod
+    def _fun_facts(gazetteer, i):
+        hemisphere = "northern" if gazetteer.lat[i] >= 0 else "southern"
+        return [f"it lies in the {hemisphere} hemisphere.", "it is the seat of its country's government."]
+
+    @staticmethod
+    def _make_round(gazetteer, target, guess):
+        distance = gazetteer.distance_km(target, guess)
+        return {
+            "target_capital": {"name": gazetteer.names[target], "country": gazetteer.countries[target]},
+            "guess_capital": {
+                "name": gazetteer.names[guess],
+                "country": gazetteer.countries[guess],
+                "fun_facts": [
+                    f"it would take you about {max(1, round(distance / 800))} hours to fly there.",
+                    *FakeBackend._fun_facts(gazetteer, guess),
+                ],
+            },
+            "distance_km": distance,
+        }
+
+    def evaluate(self, city_details, user_guess):
+        self._wait()
+        return self._evaluate(city_details, user_guess)
+
+    @staticmethod
+    def _evaluate(city_details, user_guess):
+        result = evaluate_locally(city_details, user_guess)
+        if result is not None:
+            return result
+        return {
+            "guess_correct": False,
+            "is_capital": False,
+            "valid_city": False,
+            "distance_to_guess": None,
+            "comment": "That does not look like a city we know. Try again!",
+        }
+
+    def stream_evaluation(self, city_details, user_guess):
+        # Spread the latency over small chunks, like a model generating tokens
+        text = json.dumps(self._evaluate(city_details, user_guess))
+        chunks = [text[i:i + 8] for i in range(0, len(text), 8)]
+        for chunk in chunks:
+            if self.latency > 0:
+                time.sleep(self.latency / len(chunks))
+            yield chunk
+
+
+class RecordReplayBackend(LLMBackend):
+    """
+    Records another backend's answers to a JSON lines file, or replays them.
+
+    In "record" mode every call goes to `inner` and the answer is appended to the
+    file. In "replay" mode answers are served from the file (cycling through the
+    recordings made for the same request); unknown requests go to `inner` when one
+    is given and raise KeyError otherwise.
+    """
+
+    def __init__(self, path, inner=None, mode="replay"):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("Recording needs an inner backend")
+        self.path = path
+        self.inner = inner
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._recordings = {}
+        self._positions = {}
+        if mode == "replay" and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._recordings.setdefault(entry["key"], []).append(entry["response"])
+
+    def _call(self, method, *args):
+        key = request_key(method, *args)
+        if self.mode == "replay":
+            with self._lock:
+                responses = self._recordings.get(key)
+                if responses:
+                    position = self._positions.get(key, 0)
+                    self._positions[key] = position + 1
+                    return json.loads(json.dumps(responses[position % len(responses)]))
+            if self.inner is None:
+                raise KeyError(f"No recording for {method}")
+        response = getattr(self.inner, method)(*args)
+        if self.mode == "record":
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "method": method, "response": response}) + "\n")
+        return response
+
+    def fetch_rounds(self, count):
+        return self._call("fetch_rounds", count)
+
+    def fetch_fun_facts(self, name, country):
+        return self._call("fetch_fun_facts", name, country)
+
+    def evaluate(self, city_details, user_guess):
+        return self._call("evaluate", city_details, user_guess)
+
+
+def create_backend(kind="openai", openai_api_key=None, **settings):
+    """
+    Build a backend by name.
+
+    Args:
+        kind (str): "openai", "fake", "record" or "replay".
+        openai_api_key (str): Key used by every OpenAI backend built here (including
+            a wrapped one) whose settings do not set api_key themselves.
+        settings: Keyword arguments for the backend. "record" and "replay" take a
+            `path` plus an optional `inner` section ({"kind": ..., ...}) describing
+            the wrapped backend.
+
+    Returns:
+        LLMBackend: The configured backend.
+    """
+    if kind == "openai":
+        settings.setdefault("api_key", openai_api_key)
+        return OpenAIBackend(**settings)
+    if kind == "fake":
+        return FakeBackend(**settings)
+    if kind in ("record", "replay"):
+        inner_settings = dict(settings.pop("inner", {}) or {})
+        inner = create_backend(openai_api_key=openai_api_key, **inner_settings) if inner_settings else None
+        return RecordReplayBackend(inner=inner, mode=kind, **settings)
+    raise ValueError(f"Unknown backend: {kind}")
@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from assets.sqlite_local import thread_local_connection
+
+# Default location of the on-disk tier, shared by every Streamlit worker on the host
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "evaluations.sqlite3")
+
+
+def cache_key(*parts):
+    """
+    Content address for a tuple of already-normalized strings.
+    """
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class EvaluationCache:
+    """
+    Two-tier cache for JSON-serializable results.
+
+    The first tier is an in-process LRU dictionary; the second is a SQLite file that
+    every worker process reads and writes, so a result computed by one session is
+    reused by all others. Entries expire after `ttl_seconds`, and each tier is
+    size-bounded (least recently used entries are evicted first).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_memory_entries=2048, max_disk_entries=100_000, ttl_seconds=30 * 24 * 3600):
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = thread_local_connection(path, synchronous="NORMAL")
+        self._writes_since_trim = 0
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._connection().execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or None on a miss.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return value
+                del self._memory[key]
+
+        if self.path:
+            try:
+                conn = self._connection()
+                row = conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self._count("disk_hits")
+                    return value
+            except sqlite3.Error:
+                pass
+
+        self._count("misses")
+        return None
+
+    def set(self, key, value):
+        """
+        Store `value` in both tiers.
+        """
+        now = time.time()
+        self._remember(key, now, value)
+        self._count("writes")
+        if not self.path:
+            return
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO entries (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            with self._lock:
+                self._writes_since_trim += 1
+                trim = self._writes_since_trim >= 100
+                if trim:
+                    self._writes_since_trim = 0
+            if trim:
+                self._trim_disk(now)
+        except sqlite3.Error:
+            pass
+
+    def _remember(self, key, created, value):
+        with self._lock:
+            self._memory[key] = (created, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _trim_disk(self, now):
+        # Drop expired rows, then the least recently used ones beyond the size bound
+        conn = self._connection()
+        expired = conn.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl_seconds,)).rowcount
+        overflow = conn.execute(
+            "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_disk_entries,),
+        ).rowcount
+        self._count("evictions", max(expired, 0) + max(overflow, 0))
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def metrics(self):
+        """
+        Hit/miss counters plus the current size of the in-memory tier.
+        """
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = lookups - self._counters["misses"]
+            return {
+                **self._counters,
+                "memory_entries": len(self._memory),
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,240 @@
+import copy
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+
+# --- ERRORS ---
+
+class DispatchError(Exception):
+    """
+    Base class for requests the dispatcher could not complete.
+
+    `busy` is True when the request was refused to protect the upstream API
+    (local rate limit or concurrency limit), as opposed to the API failing.
+    """
+    busy = False
+
+
+class RateLimitedError(DispatchError):
+    """
+    No request token became available in time, or the API kept answering 429.
+    """
+    busy = True
+
+
+class OverloadedError(DispatchError):
+    """
+    Every concurrency slot stayed taken for the whole wait.
+    """
+    busy = True
+
+
+class UpstreamError(DispatchError):
+    """
+    The request failed and retrying did not help; the original error is the __cause__.
+    """
+
+
+# --- RATE LIMITING ---
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `burst` saved up.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """
+        Take one token, waiting up to `timeout` seconds. Returns False if none came.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return True
+                wait = (1.0 - self._tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+# --- DISPATCHER ---
+
+class Dispatcher:
+    """
+    Shared gate in front of a remote API, one per backend (and so one per server process).
+
+    Every call takes a token from the rate limiter and one of `max_concurrency`
+    slots, so a traffic spike queues (for at most `max_wait` seconds) instead of
+    turning into a burst of requests and 429s. Identical requests already in flight
+    are coalesced: later callers wait for the first one and get a copy of its
+    answer. Retryable failures are retried with full-jitter exponential backoff, and
+    everything that still fails surfaces as a DispatchError subclass.
+    """
+
+    def __init__(self, rate_per_second=3.0, burst=10, max_concurrency=8, max_retries=3,
+                 base_delay=0.5, max_delay=8.0, max_wait=10.0, is_retryable=None, is_rate_limit=None):
+        """
+        Args:
+            rate_per_second (float): Sustained requests per second.
+            burst (int): Requests that may be sent at once after a quiet period.
+            max_concurrency (int): Requests allowed in flight at the same time.
+            max_retries (int): Extra attempts for retryable failures.
+            base_delay (float): Backoff cap of the first retry, doubled on every retry.
+            max_delay (float): Upper bound of the backoff cap.
+            max_wait (float): Seconds a call may wait for a token or a slot.
+            is_retryable (callable): Takes an exception, True if retrying may help.
+            is_rate_limit (callable): Takes an exception, True if the API rejected the rate.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self._is_retryable = is_retryable or (lambda error: False)
+        self._is_rate_limit = is_rate_limit or (lambda error: False)
+        self._bucket = TokenBucket(rate_per_second, burst)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._random = random.Random()
+        self._counters = {"calls": 0, "coalesced": 0, "retries": 0, "rate_limited": 0, "overloaded": 0, "failures": 0}
+
+    def call(self, func, *args, key=None):
+        """
+        Run func(*args) under the limits and return its result.
+
+        Args:
+            key (str): Identity of the request; calls with the same key that overlap
+                share one upstream request. None disables coalescing.
+
+        Raises:
+            DispatchError: The request was refused or failed.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            return copy.deepcopy(future.result())
+        try:
+            result = self._run(func, args)
+        except BaseException as e:
+            self._leave(key, future, error=e)
+            raise
+        self._leave(key, future, result=result)
+        return result
+
+    def stream(self, func, *args, key=None):
+        """
+        Streaming variant of call: func(*args) returns an iterator of text chunks.
+
+        The slot is held while the chunks are read. Failures before the first chunk
+        are retried; later ones are raised as UpstreamError. Coalesced callers receive
+        the leader's complete text as one chunk once it is done.
+        """
+        future, leader = self._join(key)
+        if not leader:
+            yield future.result()
+            return
+        chunks = []
+        try:
+            self._acquire()
+            try:
+                for chunk in self._attempts(lambda: self._started(func(*args))):
+                    chunks.append(chunk)
+                    yield chunk
+            except DispatchError:
+                raise
+            except Exception as e:
+                self._count("failures")
+                raise UpstreamError(str(e)) from e
+            finally:
+                self._slots.release()
+        except GeneratorExit:
+            self._leave(key, future, error=UpstreamError("The stream was abandoned"))
+            raise
+        except BaseException as e:
+            self._leave(key, future, error=e)
+            raise
+        self._leave(key, future, result="".join(chunks))
+
+    @staticmethod
+    def _started(chunks):
+        # Read the first chunk right away so connection errors happen inside the retry loop
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        return chunks if first is None else itertools.chain([first], chunks)
+
+    def _join(self, key):
+        # Returns (future, True) for the caller that has to do the work
+        with self._lock:
+            self._counters["calls"] += 1
+            if key is not None and key in self._in_flight:
+                self._counters["coalesced"] += 1
+                return self._in_flight[key], False
+            future = Future()
+            if key is not None:
+                self._in_flight[key] = future
+            return future, True
+
+    def _leave(self, key, future, result=None, error=None):
+        with self._lock:
+            if key is not None and self._in_flight.get(key) is future:
+                del self._in_flight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _acquire(self):
+        if not self._slots.acquire(timeout=self.max_wait):
+            self._count("overloaded")
+            raise OverloadedError("Too many requests are already in flight")
+
+    def _run(self, func, args):
+        self._acquire()
+        try:
+            return self._attempts(lambda: func(*args))
+        finally:
+            self._slots.release()
+
+    def _attempts(self, start):
+        # Call start() until it succeeds or retrying stops making sense
+        for attempt in range(self.max_retries + 1):
+            if not self._bucket.acquire(self.max_wait):
+                self._count("rate_limited")
+                raise RateLimitedError("Request rate limit reached")
+            try:
+                return start()
+            except DispatchError:
+                raise
+            except Exception as e:
+                if not self._is_retryable(e) or attempt == self.max_retries:
+                    self._count("failures")
+                    if self._is_rate_limit(e):
+                        raise RateLimitedError(str(e)) from e
+                    raise UpstreamError(str(e)) from e
+                self._count("retries")
+                time.sleep(self._random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def metrics(self):
+        """
+        Lifetime counters plus the number of requests being coalesced right now.
+        """
+        with self._lock:
+            return {"in_flight": len(self._in_flight), **self._counters}
+
@@ -0,0 +1,188 @@
+import uuid
+
+from assets.round_store import RoundStore
+from assets.running_stats import RunningStats
+
+# Pure-Python round lifecycle shared by play.py and the headless benchmarks.
+# Every function works on a mutable mapping: st.session_state in the app, a plain dict elsewhere.
+
+# --- SESSION STATE DEFAULTS ---
+# Default values used to track game progress and statistics
+DEFAULT_STATE = {
+    "game_data": None,  # Stores data for all completed rounds (a RoundStore)
+    "total_guesses": 0,  # Total guesses across all rounds
+    "total_non_capitals": 0,  # Total non-capitals guessed
+    "total_distance_off": 0,  # Cumulative distance off from correct answers
+    "start_playing_clicked": False,  # Indicates if the game has started
+    "round_number": 1,  # Current round number
+    "current_round": None,  # Data for the ongoing round
+    "guesses_this_round": 0,  # Guesses made in the current round
+    "non_capitals_this_round": 0,  # Non-capitals guessed in the current round
+    "distance_off_this_round": 0,  # Distance off in the current round
+    "guess_history": [],  # Stores guesses and outcomes for the current round
+    "hints": [],  # Hints for the current round
+    "hint_index": 0,  # Tracks which hint to show next
+    "round_complete": False,  # Indicates if the round is complete
+    "play_again_triggered": False,  # Tracks if "play again" was clicked
+    "round_index": 0,  # Tracks round order programmatically
+    "average_guesses_previous": 0,  # Avg guesses from previous rounds
+    "average_guesses_current": 0,  # Current avg guesses
+    "delta_guesses": 0,  # Change in avg guesses
+    "average_far_off": 0,  # Avg distance off from target
+    "round_stats": None,  # Running aggregates over completed rounds (see new_round_stats)
+    "player_id": None,  # Id used by the cross-session stats store; kept in the URL by utils.remember_player
+    "player_name": "",  # Optional display name for the leaderboard
+}
+
+# Possible outcomes of record_guess
+INVALID = "invalid"  # Not a city, or not a capital
+INCORRECT = "incorrect"  # A capital, but the wrong one
+NO_DISTANCE = "no_distance"  # A wrong capital whose distance could not be calculated
+CORRECT = "correct"
+
+
+def new_round_stats():
+    """
+    One running aggregate per per-round metric, updated as rounds are completed.
+    """
+    return {"Guesses": RunningStats(), "Non-Capitals": RunningStats(), "Distance Off": RunningStats()}
+
+
+def initialize_state(state):
+    """
+    Fill in every missing key with its default value.
+    """
+    for key, value in DEFAULT_STATE.items():
+        if key not in state:
+            state[key] = list(value) if isinstance(value, list) else value
+    if state["player_id"] is None:
+        state["player_id"] = uuid.uuid4().hex
+    if state["game_data"] is None:
+        state["game_data"] = RoundStore()
+    elif not isinstance(state["game_data"], RoundStore):  # Sessions that predate the columnar store
+        state["game_data"] = RoundStore.from_records(state["game_data"])
+    if state["round_stats"] is None:
+        state["round_stats"] = new_round_stats()
+        for round_data in state["game_data"]:  # Sessions that predate the aggregates
+            for metric, running in state["round_stats"].items():
+                running.push(round_data[metric])
+
+
+def archive_round(state):
+    """
+    Save the completed round to game_data and fold it into the running aggregates.
+
+    Returns:
+        bool: True if a round was archived.
+    """
+    if not (state["round_complete"] and state["guess_history"]):
+        return False
+    round_stats = state["round_stats"]
+    round_stats["Guesses"].push(state["guesses_this_round"])
+    round_stats["Non-Capitals"].push(state["non_capitals_this_round"])
+    round_stats["Distance Off"].push(state["distance_off_this_round"])
+    state["game_data"].append_round(
+        round_number=state["round_number"] - 1,
+        guesses=state["guesses_this_round"],
+        non_capitals=state["non_capitals_this_round"],
+        distance_off=state["distance_off_this_round"],
+        target_capital=state["current_round"]["guess_capital"]["name"],
+        target_country=state["current_round"]["guess_capital"]["country"],
+        guess_history=state["guess_history"],
+    )
+    return True
+
+
+def begin_round(state, round_data):
+    """
+    Reset the per-round state for `round_data`. Call archive_round first to keep the previous round.
+    """
+    state["current_round"] = round_data
+    state["guesses_this_round"] = 0
+    state["non_capitals_this_round"] = 0
+    state["distance_off_this_round"] = 0
+    state["guess_history"] = []
+    state["round_complete"] = False
+    state["hint_index"] = 0
+    state["play_again_triggered"] = False
+    state["round_index"] += 1  # Increment round index for tracking
+    target = round_data["guess_capital"]
+    state["hints"] = target["fun_facts"] + [f"It is in {target['country']}"]
+
+
+def record_guess(state, guess, evaluation):
+    """
+    Apply an evaluated guess to the session statistics.
+
+    Args:
+        state: Session state mapping.
+        guess (str): The guess as typed by the player.
+        evaluation (dict): Result of evaluate_guess.
+
+    Returns:
+        str: One of INVALID, INCORRECT, NO_DISTANCE or CORRECT.
+    """
+    state["guesses_this_round"] += 1
+    state["total_guesses"] += 1
+
+    if not evaluation["is_capital"] or not evaluation["valid_city"]:
+        # Invalid city or not a capital
+        state["non_capitals_this_round"] += 1
+        state["total_non_capitals"] += 1
+        outcome = INVALID
+    elif not evaluation["guess_correct"]:
+        # Valid capital but incorrect guess
+        distance = evaluation.get("distance_to_guess", "N/A")
+        if isinstance(distance, (int, float)):
+            state["distance_off_this_round"] += distance
+            state["total_distance_off"] += distance
+            outcome = INCORRECT
+        else:
+            outcome = NO_DISTANCE
+    else:
+        outcome = CORRECT
+
+    # Add guess details to guess history
+    state["guess_history"].append({
+        "Guess": guess,
+        "Correct": evaluation["guess_correct"],
+        "Distance": evaluation.get("distance_to_guess", "N/A"),
+        "Capital": evaluation["is_capital"],
+        "Comment": evaluation["comment"]
+    })
+    update_realtime_stats(state)
+
+    # Move to the next round if completed
+    if outcome == CORRECT:
+        state["round_complete"] = True
+        state["round_number"] += 1
+    return outcome
+
+
+def next_hint(state):
+    """
+    Return the next hint for the current round, or None once they are all shown.
+    """
+    if state["hint_index"] >= len(state["hints"]):
+        return None
+    hint = state["hints"][state["hint_index"]]
+    state["hint_index"] += 1
+    return hint
+
+
+def update_realtime_stats(state):
+    """
+    Update session statistics dynamically during the game, in O(1) from the running aggregates.
+    """
+    round_stats = state["round_stats"]
+    state["average_guesses_previous"] = state["average_guesses_current"]
+    if round_stats["Guesses"].count:
+        state["average_guesses_current"] = round_stats["Guesses"].mean
+    else:
+        state["average_guesses_current"] = state["guesses_this_round"]
+    state["delta_guesses"] = state["average_guesses_current"] - state["average_guesses_previous"]
+
+    if round_stats["Distance Off"].count:
+        state["average_far_off"] = round_stats["Distance Off"].mean
+    else:
+        state["average_far_off"] = state["distance_off_this_round"]
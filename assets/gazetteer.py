@@ -0,0 +1,218 @@
+import csv
+import os
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+from assets.name_index import TrigramIndex
+
+# Bundled list of world capitals (plus well-known non-capital cities) with coordinates
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "capitals.csv")
+
+# Exonyms, former names and common alternate spellings, mapped to gazetteer names
+ALIASES_PATH = os.path.join(os.path.dirname(__file__), "aliases.csv")
+
+# Punctuation that may appear in place names (Port-au-Prince, N'Djamena, St. George's)
+NAME_PUNCTUATION = "-‐–'’."
+
+# Mean Earth radius used by the haversine formula
+EARTH_RADIUS_KM = 6371.0088
+
+
+_PUNCTUATION_TABLE = str.maketrans({"-": " ", "\u2010": " ", "\u2013": " ", "'": None, "\u2019": None, ".": None})
+
+
+def normalize_name(name):
+    """
+    Normalize a city name for lookups: casefolded, diacritics and apostrophes
+    stripped, hyphens turned into spaces, single-spaced.
+    """
+    decomposed = unicodedata.normalize("NFKD", str(name))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().translate(_PUNCTUATION_TABLE).split())
+
+
+def looks_like_place_name(text):
+    """
+    True if `text` only has letters, spaces and the punctuation used in place names.
+    """
+    return any(ch.isalpha() for ch in text) and all(ch.isalpha() or ch.isspace() or ch in NAME_PUNCTUATION for ch in text)
+
+
+def max_typos(key):
+    """
+    Edit distance tolerated for a normalized name of this length.
+
+    Names of six letters or fewer must match exactly: at that length one edit
+    already turns real cities the gazetteer does not list into capitals
+    (Vienne into Vienna), so those guesses are left to the model.
+    """
+    if len(key) <= 6:
+        return 0
+    return 1 if len(key) <= 8 else 2
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Vectorized great-circle distance in kilometers.
+
+    All coordinates are in radians and may be scalars or NumPy arrays; the usual
+    broadcasting rules apply, so one point can be compared against a whole array.
+    """
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat / 2.0) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2.0) ** 2
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class Gazetteer:
+    """
+    In-memory city table backed by NumPy arrays, with a name index for O(1) lookups
+    (official names and aliases) and a trigram index for typo-tolerant guesses.
+    """
+
+    def __init__(self, names, countries, lat_deg, lon_deg, is_capital, aliases=()):
+        self.names = names
+        self.countries = countries
+        self.lat = np.radians(np.asarray(lat_deg, dtype=np.float64))
+        self.lon = np.radians(np.asarray(lon_deg, dtype=np.float64))
+        self.is_capital = np.asarray(is_capital, dtype=bool)
+
+        # Capitals win name collisions (e.g. Victoria, Kingston)
+        self._index = {}
+        for i in np.argsort(~self.is_capital, kind="stable"):
+            self._index.setdefault(normalize_name(names[i]), []).append(int(i))
+        for alias, name in aliases:
+            rows = self._index.get(normalize_name(name))
+            if rows:
+                self._index.setdefault(normalize_name(alias), list(rows))
+        self._typo_index = None
+
+    def __len__(self):
+        return len(self.names)
+
+    def lookup(self, name, country=None):
+        """
+        Return the row index for a city name, or None if it is unknown.
+
+        When a country is given it is used to pick between same-named cities; a
+        unique name is accepted even if the country is spelled differently ("USA").
+        """
+        rows = self._index.get(normalize_name(name))
+        if not rows:
+            return None
+        if country is None:
+            return rows[0]
+        wanted = normalize_name(country)
+        match = next((i for i in rows if normalize_name(self.countries[i]) == wanted), None)
+        if match is None and len(rows) == 1:
+            return rows[0]
+        return match
+
+    def resolve(self, name):
+        """
+        Resolve a player's guess to a row index: exact name or alias first, then the
+        closest name within a small edit distance. Returns None for unknown or
+        ambiguous input, which is left to the model.
+        """
+        key = normalize_name(name)
+        rows = self._index.get(key)
+        if rows:
+            return rows[0]
+        limit = max_typos(key)
+        if not limit:
+            return None
+        if self._typo_index is None:
+            self._typo_index = TrigramIndex(self._index)
+        matches = self._typo_index.search(key, limit)
+        if not matches:
+            return None
+        best = matches[0][0]
+        candidates = {self._index[word][0] for distance, word in matches if distance == best}
+        if len(candidates) > 1:
+            capitals = [i for i in candidates if self.is_capital[i]]
+            candidates = set(capitals) if len(capitals) == 1 else candidates
+        return candidates.pop() if len(candidates) == 1 else None
+
+    def keys_for(self, i):
+        """
+        Every normalized name and alias that resolves to row i.
+        """
+        return [key for key, rows in self._index.items() if i in rows]
+
+    def distance_km(self, i, j):
+        """
+        Great-circle distance between two rows, rounded to the nearest kilometer.
+        """
+        return int(round(float(haversine_km(self.lat[i], self.lon[i], self.lat[j], self.lon[j]))))
+
+    def distances_from(self, i):
+        """
+        Distances in kilometers from one row to every row of the table.
+        """
+        return haversine_km(self.lat[i], self.lon[i], self.lat, self.lon)
+
+
+@lru_cache(maxsize=None)
+def load_gazetteer(path=GAZETTEER_PATH, aliases_path=ALIASES_PATH):
+    """
+    Load the bundled gazetteer once per process.
+    """
+    names, countries, lat, lon, is_capital = [], [], [], [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            names.append(row["name"])
+            countries.append(row["country"])
+            lat.append(float(row["lat"]))
+            lon.append(float(row["lon"]))
+            is_capital.append(row["capital"] == "1")
+    with open(aliases_path, newline="", encoding="utf-8") as f:
+        aliases = [(row["alias"], row["name"]) for row in csv.DictReader(f)]
+    return Gazetteer(names, countries, lat, lon, is_capital, aliases)
+
+
+def evaluate_locally(city_details, user_guess):
+    """
+    Evaluate a guess against the gazetteer without calling the model.
+
+    Args:
+        city_details (dict): Round details as served by the round pool.
+        user_guess (str): The city guessed by the user.
+
+    Returns:
+        dict | None: Evaluation in the same shape as evaluate_guess, or None when the
+        guess or the round's correct capital is not in the gazetteer.
+    """
+    gazetteer = load_gazetteer()
+    answer = city_details["guess_capital"]
+    correct = gazetteer.lookup(answer["name"], answer.get("country"))
+    guessed = gazetteer.resolve(user_guess)
+    if correct is None or guessed is None:
+        return None
+
+    guess_correct = guessed == correct
+    is_capital = bool(gazetteer.is_capital[guessed])
+    distance = 0 if guess_correct else gazetteer.distance_km(guessed, correct)
+    return {
+        "guess_correct": guess_correct,
+        "is_capital": is_capital,
+        "valid_city": True,
+        "distance_to_guess": distance,
+        "comment": local_comment(gazetteer.names[guessed], guess_correct, is_capital, distance),
+    }
+
+
+def local_comment(city, guess_correct, is_capital, distance):
+    """
+    Short canned feedback used when the guess was resolved locally.
+    """
+    if guess_correct:
+        return f"Spot on, {city} is the capital we were looking for!"
+    if not is_capital:
+        return f"{city} is a real city, but it is not a capital. Keep going!"
+    if distance < 500:
+        return f"Very close! {city} is only {distance} km from the answer."
+    if distance < 2000:
+        return f"Warm. {city} is {distance} km from the answer."
+    return f"Not quite, {city} is {distance} km away from the answer."
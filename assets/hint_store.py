@@ -0,0 +1,211 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from assets.gazetteer import load_gazetteer, normalize_name
+from assets.sqlite_local import thread_local_connection
+
+# Default location of the hint store, shared by every worker on the host
+DEFAULT_HINTS_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "hints.sqlite3")
+
+_WORD = re.compile(r"\w+")
+_POSSESSIVE = re.compile(r"['\u2019]s\b")
+
+
+def _words(text):
+    # "Kiev's" has to match "kiev", so possessives go before apostrophes are dropped
+    return " ".join(_WORD.findall(normalize_name(_POSSESSIVE.sub("", text))))
+
+
+def leak_terms(name, country, gazetteer=None):
+    """
+    Words a hint about this capital must not contain: its name, its country and
+    every alias the gazetteer knows for it, normalized.
+    """
+    gazetteer = gazetteer or load_gazetteer()
+    terms = {_words(name), _words(country)}
+    row = gazetteer.lookup(name, country)
+    if row is not None:
+        terms.update(_words(key) for key in gazetteer.keys_for(row))
+        terms.update((_words(gazetteer.names[row]), _words(gazetteer.countries[row])))
+    terms.discard("")
+    return terms
+
+
+def find_leak(fact, terms):
+    """
+    Return the first term mentioned (as whole words) in `fact`, or None.
+    """
+    padded = f" {_words(fact)} "
+    return next((term for term in sorted(terms) if f" {term} " in padded), None)
+
+
+class HintStore:
+    """
+    Fun facts per capital, written once and reused by every round.
+
+    Facts are kept in a SQLite file (and mirrored in memory), keyed on the
+    normalized capital and country. Every fact goes through the leak check before
+    it is stored, so a hint never names the capital, its country or an alias of
+    either. Capitals are normally filled ahead of time by the batch job
+    (python -m assets.hint_store); a capital that is still missing is fetched
+    once on first use. A capital whose fetch failed, or whose facts all leaked,
+    is stored with no facts and only tried again after `retry_after` seconds, so
+    it does not cost a model call on every round that draws it.
+    """
+
+    def __init__(self, path=DEFAULT_HINTS_PATH, retry_after=6 * 3600):
+        self.path = path
+        self.retry_after = retry_after
+        self._connection = thread_local_connection(path)
+        self._lock = threading.Lock()
+        self._hints = {}
+        self._retry_at = {}  # key -> time after which a capital stored without facts is fetched again
+        self._counters = {"hits": 0, "misses": 0, "leaks": 0, "failures": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS hints ("
+            "key TEXT PRIMARY KEY, name TEXT NOT NULL, country TEXT NOT NULL, facts TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        for key, facts, created in conn.execute("SELECT key, facts, created FROM hints"):
+            self._remember(key, json.loads(facts), created)
+
+    @staticmethod
+    def _key(name, country):
+        return f"{normalize_name(name)}\x1f{normalize_name(country)}"
+
+    def _remember(self, key, facts, created):
+        self._hints[key] = facts
+        if facts:
+            self._retry_at.pop(key, None)
+        else:
+            self._retry_at[key] = created + self.retry_after
+
+    def _retry_due(self, key):
+        return key in self._retry_at and time.time() >= self._retry_at[key]
+
+    def __len__(self):
+        return sum(1 for facts in self._hints.values() if facts)
+
+    def get(self, name, country):
+        """
+        Stored facts for a capital, or None if it has none yet (or its last failure
+        is older than `retry_after`). An empty list means a recent failure.
+        """
+        key = self._key(name, country)
+        facts = self._hints.get(key)
+        if facts is None or self._retry_due(key):
+            # Another worker may have filled it since this one started
+            try:
+                row = self._connection().execute("SELECT facts, created FROM hints WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                self._remember(key, json.loads(row[0]), row[1])
+                facts = self._hints[key]
+            if self._retry_due(key):
+                facts = None
+        with self._lock:
+            self._counters["hits" if facts is not None else "misses"] += 1
+        return facts
+
+    def put(self, name, country, facts):
+        """
+        Leak-check `facts` and store the clean ones.
+
+        Returns:
+            list: The facts that passed the check. If none did, the capital is
+            stored without facts until `retry_after` has passed.
+        """
+        terms = leak_terms(name, country)
+        clean = [fact for fact in facts if find_leak(fact, terms) is None]
+        with self._lock:
+            self._counters["leaks"] += len(facts) - len(clean)
+            if not clean:
+                self._counters["failures"] += 1
+        key = self._key(name, country)
+        created = time.time()
+        self._remember(key, clean, created)
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO hints (key, name, country, facts, created) VALUES (?, ?, ?, ?, ?)",
+                (key, name, country, json.dumps(clean), created),
+            )
+        except sqlite3.Error:
+            pass
+        return clean
+
+    def hints_for(self, name, country, fetch):
+        """
+        Facts for a capital, calling fetch(name, country) and storing the result on a
+        miss. A failing fetch is stored like an empty answer.
+        """
+        facts = self.get(name, country)
+        if facts is None:
+            try:
+                fetched = fetch(name, country)
+            except Exception:
+                fetched = []
+            facts = self.put(name, country, fetched)
+        return facts
+
+    def missing(self, gazetteer=None):
+        """
+        (name, country) of every gazetteer capital without stored facts, including
+        the ones whose last fetch failed.
+        """
+        gazetteer = gazetteer or load_gazetteer()
+        return [
+            (gazetteer.names[i], gazetteer.countries[i])
+            for i in range(len(gazetteer))
+            if gazetteer.is_capital[i] and not self._hints.get(self._key(gazetteer.names[i], gazetteer.countries[i]))
+        ]
+
+    def metrics(self):
+        with self._lock:
+            return dict(self._counters, capitals=len(self), failed_capitals=len(self._retry_at))
+
+
+def fill(store, fetch, capitals, max_workers=4):
+    """
+    Fetch and store facts for many capitals concurrently.
+
+    Returns:
+        dict: Number of capitals stored and failed.
+    """
+    def fill_one(capital):
+        try:
+            return bool(store.put(*capital, fetch(*capital)))
+        except Exception:
+            return False
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        stored = sum(executor.map(fill_one, capitals))
+    return {"stored": stored, "failed": len(capitals) - stored}
+
+
+if __name__ == "__main__":
+    # Batch job: python -m assets.hint_store [--all] [--workers N]
+    import argparse
+
+    from assets.utils import get_backend, get_hint_store
+
+    parser = argparse.ArgumentParser(description="Generate fun facts for every capital that has none yet.")
+    parser.add_argument("--all", action="store_true", help="regenerate the facts of every capital")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent model requests")
+    args = parser.parse_args()
+
+    gazetteer = load_gazetteer()
+    hint_store = get_hint_store()
+    if args.all:
+        todo = [(gazetteer.names[i], gazetteer.countries[i]) for i in range(len(gazetteer)) if gazetteer.is_capital[i]]
+    else:
+        todo = hint_store.missing(gazetteer)
+    print(f"generating facts for {len(todo)} capitals")
+    print(fill(hint_store, get_backend().fetch_fun_facts, todo, args.workers))
+    print(hint_store.metrics())
@@ -0,0 +1,292 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from assets.sqlite_local import thread_local_connection
+
+# Default location of the durable stats database, shared by every worker on the host
+DEFAULT_HISTORY_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache", "history.sqlite3")
+
+# Rounds a player needs before appearing on the leaderboard
+LEADERBOARD_MIN_ROUNDS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    player_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rounds (
+    round_id INTEGER PRIMARY KEY,
+    player_id TEXT NOT NULL,
+    played_at REAL NOT NULL,
+    round_number INTEGER NOT NULL,
+    reference_city TEXT,
+    target_capital TEXT NOT NULL,
+    target_country TEXT NOT NULL,
+    guesses INTEGER NOT NULL,
+    non_capitals INTEGER NOT NULL,
+    distance_off REAL NOT NULL,
+    won INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS rounds_player_time ON rounds (player_id, played_at);
+CREATE INDEX IF NOT EXISTS rounds_time ON rounds (played_at);
+CREATE INDEX IF NOT EXISTS rounds_target ON rounds (target_capital);
+CREATE TABLE IF NOT EXISTS guesses (
+    round_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    guess TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    distance REAL,
+    is_capital INTEGER NOT NULL,
+    PRIMARY KEY (round_id, position)
+) WITHOUT ROWID;
+
+-- Pre-aggregated tables, maintained on every write so reads never scan rounds
+CREATE TABLE IF NOT EXISTS player_stats (
+    player_id TEXT PRIMARY KEY,
+    rounds INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    total_guesses INTEGER NOT NULL,
+    total_non_capitals INTEGER NOT NULL,
+    total_distance_off REAL NOT NULL,
+    best_guesses INTEGER NOT NULL,
+    last_played REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS player_stats_avg_guesses ON player_stats (total_guesses * 1.0 / rounds, rounds DESC);
+CREATE TABLE IF NOT EXISTS player_daily (
+    player_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    rounds INTEGER NOT NULL,
+    wins INTEGER NOT NULL,
+    total_guesses INTEGER NOT NULL,
+    total_distance_off REAL NOT NULL,
+    PRIMARY KEY (player_id, day)
+) WITHOUT ROWID;
+"""
+
+
+class HistoryDB:
+    """
+    Durable, cross-session record of every completed round and guess.
+
+    Writes are queued and applied by a background thread in batched transactions
+    (WAL mode, so readers are never blocked). Each batch also updates the
+    pre-aggregated player_stats and player_daily tables, which back the per-player
+    trend and the global leaderboard with indexed lookups instead of scans over
+    the rounds table.
+    """
+
+    def __init__(self, path=DEFAULT_HISTORY_PATH, batch_size=200, flush_interval=1.0, max_retries=5, retry_delay=0.5):
+        """
+        Args:
+            max_retries (int): Extra attempts for a batch that hit a transient error
+                (such as "database is locked" under several workers).
+            retry_delay (float): Wait before the first retry, doubled on every retry.
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._connection = thread_local_connection(path, timeout=10, isolation_level="", synchronous="NORMAL")
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._counters = {"written": 0, "retries": 0, "dropped": 0}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._connection().executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    # --- WRITES ---
+
+    def record_round(self, player_id, round_data, player_name=""):
+        """
+        Queue one completed round for writing; returns immediately.
+
+        Args:
+            player_id (str): Id of the player (carried in the page URL, see utils.remember_player).
+            round_data (dict): Round in the game_data format, optionally with "Reference City".
+            player_name (str): Display name for the leaderboard.
+        """
+        self._queue.put((player_id, player_name, time.time(), round_data))
+
+    def flush(self, timeout=5.0):
+        """
+        Block until every queued round has been written.
+        """
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def _write_loop(self):
+        # Nothing may end this loop: a dead writer would leave the queue growing forever
+        while True:
+            waiters = []
+            try:
+                batch, waiters = self._next_batch()
+                if batch:
+                    self._write_with_retries(batch)
+            except Exception:
+                pass
+            finally:
+                for waiter in waiters:
+                    waiter.set()
+
+    def _next_batch(self):
+        # Up to batch_size rounds, collected for at most flush_interval seconds or until a flush marker
+        batch, waiters = [], []
+        item = self._queue.get()
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            if isinstance(item, threading.Event):
+                waiters.append(item)
+                break
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                break
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+        return batch, waiters
+
+    def _write_with_retries(self, batch):
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write_batch(batch)
+                self._count("written", len(batch))
+                return
+            except sqlite3.OperationalError:
+                # Locked or busy database: back off and write the whole batch again
+                if attempt == self.max_retries:
+                    break
+                self._count("retries")
+                time.sleep(self.retry_delay * 2 ** attempt)
+            except Exception:
+                # A malformed round fails the transaction; write the rounds one by one so only it is lost
+                self._write_one_by_one(batch)
+                return
+        self._count("dropped", len(batch))
+
+    def _write_one_by_one(self, batch):
+        for entry in batch:
+            try:
+                self._write_batch([entry])
+                self._count("written")
+            except Exception:
+                self._count("dropped")
+
+    def _write_batch(self, batch):
+        conn = self._connection()
+        with conn:
+            for player_id, player_name, played_at, round_data in batch:
+                self._write_round(conn, player_id, player_name, played_at, round_data)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def metrics(self):
+        """
+        Lifetime write counters and the number of rounds waiting to be written.
+        """
+        with self._lock:
+            return {"queued": self._queue.qsize(), **self._counters}
+
+    @staticmethod
+    def _write_round(conn, player_id, player_name, played_at, round_data):
+        won = int(bool(round_data["Round Won"]))
+        guesses = int(round_data["Guesses"])
+        non_capitals = int(round_data["Non-Capitals"])
+        distance_off = float(round_data["Distance Off"])
+        day = time.strftime("%Y-%m-%d", time.gmtime(played_at))
+
+        conn.execute(
+            "INSERT INTO players (player_id, name, created) VALUES (?, ?, ?) "
+            "ON CONFLICT (player_id) DO UPDATE SET name = excluded.name WHERE excluded.name != ''",
+            (player_id, player_name, played_at),
+        )
+        round_id = conn.execute(
+            "INSERT INTO rounds (player_id, played_at, round_number, reference_city, target_capital, "
+            "target_country, guesses, non_capitals, distance_off, won) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (player_id, played_at, int(round_data["Round"]), round_data.get("Reference City"),
+             round_data["Target Capital"], round_data["Target Country"], guesses, non_capitals, distance_off, won),
+        ).lastrowid
+        conn.executemany(
+            "INSERT INTO guesses (round_id, position, guess, correct, distance, is_capital) VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (round_id, position, guess["Guess"], int(bool(guess["Correct"])),
+                 guess["Distance"] if isinstance(guess["Distance"], (int, float)) else None, int(bool(guess["Capital"])))
+                for position, guess in enumerate(round_data["Guess History"])
+            ],
+        )
+        conn.execute(
+            "INSERT INTO player_stats VALUES (?, 1, ?, ?, ?, ?, ?, ?) ON CONFLICT (player_id) DO UPDATE SET "
+            "rounds = rounds + 1, wins = wins + excluded.wins, total_guesses = total_guesses + excluded.total_guesses, "
+            "total_non_capitals = total_non_capitals + excluded.total_non_capitals, "
+            "total_distance_off = total_distance_off + excluded.total_distance_off, "
+            "best_guesses = MIN(best_guesses, excluded.best_guesses), last_played = excluded.last_played",
+            (player_id, won, guesses, non_capitals, distance_off, guesses, played_at),
+        )
+        conn.execute(
+            "INSERT INTO player_daily VALUES (?, ?, 1, ?, ?, ?) ON CONFLICT (player_id, day) DO UPDATE SET "
+            "rounds = rounds + 1, wins = wins + excluded.wins, total_guesses = total_guesses + excluded.total_guesses, "
+            "total_distance_off = total_distance_off + excluded.total_distance_off",
+            (player_id, day, won, guesses, distance_off),
+        )
+
+    # --- READS ---
+
+    def player_summary(self, player_id):
+        """
+        Lifetime totals for one player, or None if they have not finished a round yet.
+        """
+        row = self._connection().execute(
+            "SELECT rounds, total_guesses, total_non_capitals, total_distance_off, best_guesses "
+            "FROM player_stats WHERE player_id = ?",
+            (player_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        rounds, total_guesses, total_non_capitals, total_distance_off, best_guesses = row
+        return {
+            "Rounds": rounds,
+            "Avg Guesses": total_guesses / rounds,
+            "Avg Distance Off (km)": total_distance_off / rounds,
+            "Total Non-Capitals": total_non_capitals,
+            "Best Round (guesses)": best_guesses,
+        }
+
+    def player_trend(self, player_id, days=30):
+        """
+        Per-day rounds and averages for one player over the last `days` days.
+        """
+        since = time.strftime("%Y-%m-%d", time.gmtime(time.time() - days * 86400))
+        rows = self._connection().execute(
+            "SELECT day, rounds, total_guesses * 1.0 / rounds, total_distance_off / rounds "
+            "FROM player_daily WHERE player_id = ? AND day >= ? ORDER BY day",
+            (player_id, since),
+        ).fetchall()
+        return [
+            {"Day": day, "Rounds": rounds, "Avg Guesses": avg_guesses, "Avg Distance Off (km)": avg_distance}
+            for day, rounds, avg_guesses, avg_distance in rows
+        ]
+
+    def leaderboard(self, limit=10, min_rounds=LEADERBOARD_MIN_ROUNDS):
+        """
+        Top players by fewest guesses per round, among players with at least
+        `min_rounds` rounds; ties go to the player with more rounds.
+        """
+        rows = self._connection().execute(
+            "SELECT s.player_id, p.name, s.total_guesses * 1.0 / s.rounds, s.rounds, s.best_guesses "
+            "FROM player_stats AS s JOIN players AS p USING (player_id) WHERE s.rounds >= ? "
+            "ORDER BY s.total_guesses * 1.0 / s.rounds, s.rounds DESC LIMIT ?",
+            (min_rounds, limit),
+        ).fetchall()
+        return [
+            {"Player": name or f"Player {player_id[:6]}", "Avg Guesses": avg_guesses, "Rounds": rounds, "Best Round (guesses)": best_guesses}
+            for player_id, name, avg_guesses, rounds, best_guesses in rows
+        ]
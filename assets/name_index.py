@@ -0,0 +1,93 @@
+from collections import Counter
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Damerau (optimal string alignment) edit distance, so a swapped pair of letters
+    counts as one typo.
+
+    Gives up early and returns max_distance + 1 as soon as the distance is known to
+    exceed `max_distance`.
+    """
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        before_previous, previous = previous, current
+    return min(previous[-1], max_distance + 1)
+
+
+def trigrams(word):
+    """
+    Padded character trigrams of a word.
+    """
+    padded = f"  {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class TrigramIndex:
+    """
+    Trigram index over a fixed vocabulary for typo-tolerant lookups.
+
+    One edit changes at most four trigram positions (a swap touches four), so a
+    word within k edits of the query shares at least len(trigrams) - 4k of them,
+    counted with repetitions. Only those candidates are checked with the
+    (early-exit) edit distance.
+    """
+
+    def __init__(self, words=()):
+        self._postings = {}
+        self._lengths = {}
+        for word in words:
+            self.add(word)
+
+    def add(self, word):
+        if word in self._lengths:
+            return
+        grams = trigrams(word)
+        self._lengths[word] = len(grams)
+        for gram, count in Counter(grams).items():
+            self._postings.setdefault(gram, []).append((word, count))
+
+    def search(self, word, max_distance):
+        """
+        All (distance, word) pairs within `max_distance` of `word`, closest first.
+        """
+        grams = trigrams(word)
+        shared = Counter()
+        for gram, count in Counter(grams).items():
+            for candidate, candidate_count in self._postings.get(gram, ()):
+                shared[candidate] += min(count, candidate_count)
+        # Counted on every trigram, not the distinct ones, so repetitive queries ("zzzzzzzz") keep a real bound
+        needed = len(grams) - 4 * max_distance
+        matches = []
+        for candidate, count in shared.items():
+            if count < needed or abs(self._lengths[candidate] - len(grams)) > max_distance:
+                continue
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        if needed <= 0:
+            # Only when max_distance is large for the query's length: words sharing no trigram can still match
+            for candidate in self._lengths.keys() - shared.keys():
+                if abs(self._lengths[candidate] - len(grams)) <= max_distance:
+                    distance = edit_distance(word, candidate, max_distance)
+                    if distance <= max_distance:
+                        matches.append((distance, candidate))
+        matches.sort()
+        return matches
@@ -0,0 +1,314 @@
+import random
+import threading
+import time
+
+from assets.engine import CORRECT, archive_round, begin_round, initialize_state, next_hint, record_guess
+
+# Room codes avoid characters that are easy to confuse (0/O, 1/I)
+ROOM_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+ROOM_CODE_LENGTH = 5
+
+
+class RoomError(Exception):
+    """
+    A room action that is not allowed (unknown room, full room, not the host...).
+    """
+
+
+class Room:
+    """
+    One shared game: its players, the round they all play and a change counter.
+
+    Every player keeps an ordinary engine state (the same mapping play.py keeps in
+    st.session_state), so guesses, hints and stats follow the single-player rules.
+    `version` is bumped on every change; pages poll it to refresh the scoreboard
+    only when something happened. `last_seen` holds when each player last polled or
+    acted, so a host who went away can be replaced. `closed` is set once the room is
+    dropped from the engine, so a late join cannot land in it. All fields are guarded
+    by `lock`.
+    """
+
+    def __init__(self, code, host_id):
+        self.code = code
+        self.host_id = host_id
+        self.lock = threading.Lock()
+        self.players = {}  # player_id -> engine state
+        self.last_seen = {}  # player_id -> time.monotonic() of their last poll or action
+        self.round_data = None
+        self.round_number = 0
+        self.fetching = False
+        self.version = 0
+        self.last_active = time.monotonic()
+        self.closed = False
+        self._scoreboard = (-1, [])
+
+    def _touch(self):
+        self.version += 1
+        self.last_active = time.monotonic()
+
+    def scoreboard(self):
+        """
+        One row per player, best first; rebuilt only when the room has changed.
+        """
+        with self.lock:
+            if self._scoreboard[0] != self.version:
+                rows = []
+                for state in self.players.values():
+                    rows.append({
+                        "Player": state["player_name"] or f"Player {state['player_id'][:6]}",
+                        "Solved": state["round_complete"],
+                        "Guesses": state["guesses_this_round"],
+                        "Rounds Won": len(state["game_data"]) + int(state["round_complete"]),
+                        "Total Guesses": state["total_guesses"],
+                        "Distance Off (km)": state["total_distance_off"],
+                    })
+                rows.sort(key=lambda row: (-row["Rounds Won"], row["Total Guesses"], row["Distance Off (km)"]))
+                self._scoreboard = (self.version, rows)
+            return self._scoreboard[1]
+
+
+class RoomEngine:
+    """
+    Process-wide registry of multiplayer rooms.
+
+    Each round is taken from `next_round` once per room and handed to every player
+    in it, so hosting a room costs one round no matter how many people play.
+    Guesses are evaluated with `evaluate` outside the room lock (the local and cached
+    paths answer almost all of them) and then applied to the player's state under it.
+    """
+
+    def __init__(self, next_round, evaluate, on_round_complete=None, max_players=50, idle_timeout=2 * 3600, host_timeout=60):
+        """
+        Args:
+            next_round (callable): Returns a round (see backends.is_valid_round), or None.
+            evaluate (callable): evaluate(round_data, guess) returning an evaluate_guess dict.
+            on_round_complete (callable): on_round_complete(history_id, player_name, round_data)
+                for every player round that is archived (see join).
+            max_players (int): Players allowed per room.
+            idle_timeout (float): Seconds after which an unused room is dropped.
+            host_timeout (float): Seconds without a poll after which the host role
+                passes to another player.
+        """
+        self._next_round = next_round
+        self._evaluate = evaluate
+        self._on_round_complete = on_round_complete
+        self.max_players = max_players
+        self.idle_timeout = idle_timeout
+        self.host_timeout = host_timeout
+        self._next_sweep = 0.0
+        self._rooms = {}
+        self._lock = threading.Lock()
+        self._random = random.SystemRandom()
+
+    # --- ROOMS ---
+
+    def create_room(self, player_id, player_name="", history_id=None):
+        """
+        Open a room hosted by `player_id` and join it. Returns the room code.
+        """
+        self._drop_idle_rooms()
+        with self._lock:
+            code = self._new_code()
+            self._rooms[code] = Room(code, player_id)
+        self.join(code, player_id, player_name, history_id)
+        return code
+
+    def _new_code(self):
+        while True:
+            code = "".join(self._random.choice(ROOM_CODE_ALPHABET) for _ in range(ROOM_CODE_LENGTH))
+            if code not in self._rooms:
+                return code
+
+    def _drop_idle_rooms(self):
+        # Called on every lookup, so the rooms are only scanned every tenth of idle_timeout
+        now = time.monotonic()
+        if now < self._next_sweep:
+            return
+        with self._lock:
+            self._next_sweep = now + self.idle_timeout / 10
+            for code, room in list(self._rooms.items()):
+                with room.lock:
+                    if room.last_active >= now - self.idle_timeout:
+                        continue
+                    room.closed = True
+                del self._rooms[code]
+
+    def get(self, code):
+        """
+        The room with this code.
+
+        Raises:
+            RoomError: No such room (never opened, or dropped after being idle).
+        """
+        self._drop_idle_rooms()
+        room = self._rooms.get(str(code).strip().upper())
+        if room is None:
+            raise RoomError(f"There is no room {code}.")
+        return room
+
+    def join(self, code, player_id, player_name="", history_id=None):
+        """
+        Add a player to a room (joining again only updates the name) and deal them
+        the current round, if one is being played.
+
+        Args:
+            player_id (str): The player's id within rooms; other players see a prefix of it.
+            history_id (str): Id their rounds are archived under, kept private to the
+                engine; defaults to `player_id`.
+        """
+        room = self.get(code)
+        with room.lock:
+            if room.closed:
+                raise RoomError(f"There is no room {room.code}.")
+            state = room.players.get(player_id)
+            if state is None:
+                if len(room.players) >= self.max_players:
+                    raise RoomError(f"Room {room.code} is full.")
+                state = {"player_id": player_id, "history_id": history_id or player_id}
+                initialize_state(state)
+                state["start_playing_clicked"] = True
+                if room.round_data is not None:
+                    begin_round(state, room.round_data)
+                room.players[player_id] = state
+            state["player_name"] = player_name
+            room.last_seen[player_id] = time.monotonic()
+            room._touch()
+        return room
+
+    def leave(self, code, player_id):
+        """
+        Remove a player, handing the host role on if they had it; the last one out
+        closes the room.
+        """
+        room = self.get(code)
+        # Both locks, so a join cannot slip in between the room emptying and its removal
+        with self._lock, room.lock:
+            if room.players.pop(player_id, None) is None:
+                return
+            room.last_seen.pop(player_id, None)
+            if not room.players:
+                room.closed = True
+                self._rooms.pop(room.code, None)
+                return
+            if room.host_id == player_id:
+                self._hand_over_host(room)
+            room._touch()
+
+    def touch(self, code, player_id):
+        """
+        Mark a player as present; pages call this while polling the scoreboard. Hands
+        the host role on once the host has not been seen for `host_timeout` seconds.
+
+        Raises:
+            RoomError: The room is gone or the player is not in it.
+        """
+        room = self.get(code)
+        with room.lock:
+            if player_id not in room.players:
+                raise RoomError(f"You are not in room {room.code}.")
+            now = time.monotonic()
+            room.last_seen[player_id] = now
+            room.last_active = now
+            if now - room.last_seen.get(room.host_id, now) > self.host_timeout:
+                self._hand_over_host(room)
+                room._touch()
+
+    @staticmethod
+    def _hand_over_host(room):
+        # The most recently seen other player becomes host; called with room.lock held
+        others = [player_id for player_id in room.players if player_id != room.host_id]
+        if others:
+            room.host_id = max(others, key=lambda player_id: room.last_seen.get(player_id, 0.0))
+
+    # --- ROUNDS ---
+
+    def start_round(self, code, player_id):
+        """
+        Deal a new round to everyone in the room; only the host may do this.
+
+        Players who solved the previous round have it archived first (and reported
+        to on_round_complete). Returns False if no round could be fetched.
+        """
+        room = self.get(code)
+        with room.lock:
+            if player_id != room.host_id:
+                raise RoomError("Only the host can start the next round.")
+            room.last_seen[player_id] = time.monotonic()
+            if room.fetching:
+                return True
+            room.fetching = True
+        try:
+            # Fetched outside the lock so guesses keep flowing while the round is prepared
+            round_data = self._next_round()
+        finally:
+            with room.lock:
+                room.fetching = False
+        if round_data is None:
+            return False
+
+        completed = []
+        with room.lock:
+            for state in room.players.values():
+                if archive_round(state):
+                    completed.append((state["history_id"], state["player_name"], state["game_data"][-1], room.round_data))
+                begin_round(state, round_data)
+            room.round_data = round_data
+            room.round_number += 1
+            room._touch()
+        if self._on_round_complete:
+            for history_id, player_name, round_record, previous_round in completed:
+                round_record["Reference City"] = previous_round["target_capital"]["name"]
+                self._on_round_complete(history_id, player_name, round_record)
+        return True
+
+    def submit_guess(self, code, player_id, guess):
+        """
+        Evaluate and record one guess for a player.
+
+        Returns:
+            dict | None: {"outcome", "evaluation", "hint"}, or None when the guess
+            no longer applies (the player already solved the round, or a new
+            round started while it was being evaluated).
+        """
+        room = self.get(code)
+        with room.lock:
+            state = room.players.get(player_id)
+            if state is None:
+                raise RoomError(f"You are not in room {room.code}.")
+            round_data = state["current_round"]
+            if round_data is None or state["round_complete"]:
+                return None
+
+        evaluation = self._evaluate(round_data, guess)
+        if "error" in evaluation:
+            return {"outcome": None, "evaluation": evaluation, "hint": None}
+
+        with room.lock:
+            if state["current_round"] is not round_data or state["round_complete"]:
+                return None
+            outcome = record_guess(state, guess, evaluation)
+            hint = next_hint(state) if outcome != CORRECT else None
+            room.last_seen[player_id] = time.monotonic()
+            room._touch()
+        return {"outcome": outcome, "evaluation": evaluation, "hint": hint}
+
+    def player_state(self, code, player_id):
+        """
+        A copy of the player's per-round fields, for rendering.
+        """
+        room = self.get(code)
+        with room.lock:
+            state = room.players.get(player_id)
+            if state is None:
+                raise RoomError(f"You are not in room {room.code}.")
+            return {
+                "current_round": state["current_round"],
+                "round_complete": state["round_complete"],
+                "guesses_this_round": state["guesses_this_round"],
+                "guess_history": list(state["guess_history"]),
+            }
+
+    def metrics(self):
+        with self._lock:
+            rooms = list(self._rooms.values())
+        return {"rooms": len(rooms), "players": sum(len(room.players) for room in rooms)}
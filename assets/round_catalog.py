@@ -0,0 +1,154 @@
+import hashlib
+import math
+import os
+import random
+import threading
+
+import numpy as np
+
+from assets.gazetteer import load_gazetteer
+
+# Generated distance matrices live next to the other caches; they are rebuilt when the gazetteer changes
+DEFAULT_CATALOG_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache")
+
+# Distance bands for difficulty-targeted rounds, as (name, lower km, upper km)
+DISTANCE_BANDS = (
+    ("near", 0.0, 1500.0),
+    ("regional", 1500.0, 4000.0),
+    ("far", 4000.0, 9000.0),
+    ("remote", 9000.0, math.inf),
+)
+
+
+def flight_hint(distance_km):
+    """
+    The pair-specific hint every round starts with.
+    """
+    return f"it would take you about {max(1, round(distance_km / 800))} hours to fly there."
+
+
+def build_distance_matrix(gazetteer, rows, path):
+    """
+    Write the upper triangle of the distance matrix between `rows` to `path`.
+
+    The file holds n * (n - 1) / 2 float32 kilometers in row-major order (pair
+    (i, j) with i < j), written to a temporary file first so concurrent workers
+    never map a half-written matrix.
+    """
+    n = len(rows)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    matrix = np.memmap(tmp_path, dtype=np.float32, mode="w+", shape=(n * (n - 1) // 2,))
+    offset = 0
+    for a in range(n - 1):
+        distances = gazetteer.distances_from(rows[a])[rows[a + 1:]]
+        matrix[offset:offset + len(distances)] = distances
+        offset += len(distances)
+    matrix.flush()
+    del matrix
+    os.replace(tmp_path, path)
+
+
+class RoundCatalog:
+    """
+    Every playable round (ordered pair of capitals), precomputed from the gazetteer.
+
+    Capital-to-capital distances are kept in a memory-mapped, upper-triangular
+    float32 file and each pair is indexed by distance band, so sampling a uniformly
+    random round, or one from a given band, is a couple of array reads. Uniform
+    sampling gives every capital the same chance of being the one to guess.
+    """
+
+    def __init__(self, gazetteer=None, directory=DEFAULT_CATALOG_DIR, band=None, seed=None):
+        self.gazetteer = gazetteer or load_gazetteer()
+        self.rows = np.flatnonzero(self.gazetteer.is_capital)
+        self.band = band
+        n = len(self.rows)
+
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"distances-{self._fingerprint()}.f32")
+        if not os.path.exists(self.path):
+            build_distance_matrix(self.gazetteer, self.rows, self.path)
+        self.distances = np.memmap(self.path, dtype=np.float32, mode="r", shape=(n * (n - 1) // 2,))
+
+        # Pair endpoints in the same row-major order as the file, so a pair index maps straight back to capitals
+        first, second = np.triu_indices(n, k=1)
+        self._first = first.astype(np.int16)
+        self._second = second.astype(np.int16)
+
+        edges = [lower for _, lower, _ in DISTANCE_BANDS[1:]]
+        band_of_pair = np.searchsorted(edges, self.distances, side="right")
+        self.bands = {name: np.flatnonzero(band_of_pair == b).astype(np.int32) for b, (name, _, _) in enumerate(DISTANCE_BANDS)}
+        if band is not None and band not in self.bands:
+            raise ValueError(f"Unknown distance band: {band}")
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _fingerprint(self):
+        # Changes whenever a capital is added, renamed or moved
+        digest = hashlib.sha256()
+        digest.update("\x1f".join(self.gazetteer.names[i] for i in self.rows).encode("utf-8"))
+        digest.update(np.ascontiguousarray(self.gazetteer.lat[self.rows]).tobytes())
+        digest.update(np.ascontiguousarray(self.gazetteer.lon[self.rows]).tobytes())
+        return digest.hexdigest()[:16]
+
+    def __len__(self):
+        # Ordered pairs: each unordered pair can be played in both directions
+        return 2 * len(self.distances)
+
+    def band_sizes(self):
+        return {name: 2 * len(pairs) for name, pairs in self.bands.items()}
+
+    def sample(self, band=None):
+        """
+        Pick a random round.
+
+        Args:
+            band (str): Name of a DISTANCE_BANDS entry, or None for the catalog's
+                default band (uniform over all pairs if that is None too).
+
+        Returns:
+            tuple: (target row, guess row, distance in km) with gazetteer row indices.
+        """
+        band = band or self.band
+        pairs = self.bands[band] if band is not None else None
+        if pairs is not None and not len(pairs):
+            raise ValueError(f"No rounds in distance band: {band}")
+        with self._lock:
+            pair = pairs[self._random.randrange(len(pairs))] if pairs is not None else self._random.randrange(len(self.distances))
+            flip = self._random.random() < 0.5
+        target, guess = self.rows[self._first[pair]], self.rows[self._second[pair]]
+        if flip:
+            target, guess = guess, target
+        return int(target), int(guess), int(round(float(self.distances[pair])))
+
+    def make_round(self, band=None, fun_facts=None):
+        """
+        Sample a round in the format the game plays (see backends.is_valid_round).
+
+        Args:
+            band (str): See sample().
+            fun_facts (callable): fun_facts(name, country) returning hint sentences
+                about the guess capital; without it only the flight time hint is given.
+
+        Returns:
+            dict: The round, with no model call needed beyond `fun_facts`.
+        """
+        target, guess, distance = self.sample(band)
+        names, countries = self.gazetteer.names, self.gazetteer.countries
+        facts = [flight_hint(distance)]
+        if fun_facts is not None:
+            facts.extend(fun_facts(names[guess], countries[guess]))
+        return {
+            "target_capital": {"name": names[target], "country": countries[target]},
+            "guess_capital": {"name": names[guess], "country": countries[guess], "fun_facts": facts},
+            "distance_km": distance,
+        }
+
+
+if __name__ == "__main__":
+    # Offline generation: python -m assets.round_catalog
+    catalog = RoundCatalog()
+    print(f"{len(catalog)} rounds between {len(catalog.rows)} capitals in {catalog.path}")
+    for name, size in catalog.band_sizes().items():
+        print(f"  {name:<10}{size:>8}")
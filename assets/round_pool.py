@@ -0,0 +1,123 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RoundPool:
+    """
+    Bounded queue of ready-to-play rounds, refilled in the background.
+
+    One pool is shared by every session of a server process. Taking a round is an
+    O(1) queue pop; whenever the queue (plus rounds already being fetched) drops
+    below the low-water mark, refill jobs are handed to a small thread pool. Each
+    job asks for up to `batch_size` rounds in one call. The worker count caps how
+    many model calls run at once, so a burst of new sessions waits on the queue
+    instead of firing a burst of concurrent requests.
+    """
+
+    def __init__(self, fetch_rounds, validate=None, capacity=8, low_water=3, max_workers=1, batch_size=4):
+        """
+        Args:
+            fetch_rounds (callable): Takes a count and returns a list of round dicts.
+            validate (callable): Returns True for rounds that are safe to serve.
+            capacity (int): Maximum number of rounds kept ready.
+            low_water (int): Refill is triggered when fewer rounds than this are ready or in flight.
+            max_workers (int): Maximum number of concurrent fetches.
+            batch_size (int): Maximum number of rounds requested per fetch.
+        """
+        self._fetch_rounds = fetch_rounds
+        self.batch_size = max(1, batch_size)
+        self._validate = validate or (lambda data: isinstance(data, dict))
+        self.capacity = capacity
+        self.low_water = min(low_water, capacity)
+        self._queue = queue.Queue(maxsize=capacity)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="round-pool")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._counters = {"served": 0, "waited": 0, "batches": 0, "fetched": 0, "rejected": 0, "errors": 0}
+
+    def take(self, timeout=30):
+        """
+        Return the next ready round, waiting up to `timeout` seconds if the pool is empty.
+
+        Returns:
+            dict | None: A validated round, or None if none became ready in time.
+        """
+        try:
+            round_data = self._queue.get_nowait()
+        except queue.Empty:
+            self._count("waited")
+            round_data = self._wait_for_round(timeout)
+            if round_data is None:
+                return None
+        self._count("served")
+        self.refill()
+        return round_data
+
+    def _wait_for_round(self, timeout):
+        # Re-check the refill on every slice so failed fetches are retried while waiting
+        deadline = time.monotonic() + timeout
+        while True:
+            self.refill()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                return self._queue.get(timeout=min(remaining, 1.0))
+            except queue.Empty:
+                continue
+
+    def refill(self):
+        """
+        Schedule enough background fetches to bring the pool back up to capacity
+        once it has fallen below the low-water mark.
+        """
+        with self._lock:
+            available = self._queue.qsize() + self._in_flight
+            if available >= self.low_water:
+                return
+            missing = self.capacity - available
+            self._in_flight += missing
+        while missing > 0:
+            count = min(missing, self.batch_size)
+            self._executor.submit(self._produce, count)
+            missing -= count
+
+    def _produce(self, count):
+        try:
+            rounds = self._fetch_rounds(count)
+            self._count("batches")
+            for round_data in rounds[:count]:
+                if not self._validate(round_data):
+                    self._count("rejected")
+                    continue
+                self._count("fetched")
+                self._queue.put_nowait(round_data)
+        except queue.Full:
+            pass
+        except Exception:
+            self._count("errors")
+        finally:
+            with self._lock:
+                self._in_flight -= count
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def metrics(self):
+        """
+        Snapshot of queue depth and lifetime counters.
+        """
+        with self._lock:
+            return {
+                "depth": self._queue.qsize(),
+                "in_flight": self._in_flight,
+                "capacity": self.capacity,
+                "low_water": self.low_water,
+                **self._counters,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,152 @@
+import math
+import sys
+from array import array
+
+
+class RoundStore:
+    """
+    Columnar storage for completed rounds and their guesses.
+
+    Numbers live in typed arrays and every string (cities, countries, guesses) is
+    interned once into a shared table and stored as an index, so a round costs a
+    few dozen bytes instead of a dict plus a list of nested dicts. Guesses are kept
+    in flat columns with a per-round offset. A DataFrame view is built on demand and
+    cached until the next round is appended.
+    """
+
+    def __init__(self):
+        self._strings = []
+        self._string_ids = {}
+        # Round columns
+        self.round_number = array("i")
+        self.guesses = array("i")
+        self.non_capitals = array("i")
+        self.distance_off = array("d")
+        self.target_capital = array("i")
+        self.target_country = array("i")
+        self.round_won = array("b")
+        self.guess_offset = array("i", [0])  # Guesses of round i are guess_*[offset[i]:offset[i + 1]]
+        # Guess columns
+        self.guess_text = array("i")
+        self.guess_correct = array("b")
+        self.guess_distance = array("d")  # NaN when no distance was calculated
+        self.guess_is_capital = array("b")
+        self.guess_comment = array("i")
+        self._frames = {}
+
+    def _intern(self, value):
+        value = sys.intern(str(value))
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+        return string_id
+
+    def __len__(self):
+        return len(self.round_number)
+
+    def append_round(self, round_number, guesses, non_capitals, distance_off, target_capital, target_country, guess_history):
+        """
+        Store one completed round.
+
+        Args:
+            guess_history (list): The round's guesses as recorded by the engine
+                ({"Guess", "Correct", "Distance", "Capital", "Comment"} dicts).
+        """
+        self.round_number.append(round_number)
+        self.guesses.append(guesses)
+        self.non_capitals.append(non_capitals)
+        self.distance_off.append(distance_off)
+        self.target_capital.append(self._intern(target_capital))
+        self.target_country.append(self._intern(target_country))
+        self.round_won.append(any(guess["Correct"] for guess in guess_history))
+        for guess in guess_history:
+            distance = guess["Distance"]
+            self.guess_text.append(self._intern(guess["Guess"]))
+            self.guess_correct.append(bool(guess["Correct"]))
+            self.guess_distance.append(float(distance) if isinstance(distance, (int, float)) else math.nan)
+            self.guess_is_capital.append(bool(guess["Capital"]))
+            self.guess_comment.append(self._intern(guess["Comment"]))
+        self.guess_offset.append(len(self.guess_text))
+        self._frames.clear()
+
+    def guess_history(self, index):
+        """
+        The guesses of one round, in the engine's record format.
+        """
+        history = []
+        for i in range(self.guess_offset[index], self.guess_offset[index + 1]):
+            distance = self.guess_distance[i]
+            history.append({
+                "Guess": self._strings[self.guess_text[i]],
+                "Correct": bool(self.guess_correct[i]),
+                "Distance": "N/A" if math.isnan(distance) else distance,
+                "Capital": bool(self.guess_is_capital[i]),
+                "Comment": self._strings[self.guess_comment[i]],
+            })
+        return history
+
+    def __getitem__(self, index):
+        """
+        One round as a dict in the legacy game_data format.
+        """
+        index = range(len(self))[index]
+        return {
+            "Round": self.round_number[index],
+            "Guesses": self.guesses[index],
+            "Non-Capitals": self.non_capitals[index],
+            "Distance Off": self.distance_off[index],
+            "Guess History": self.guess_history(index),
+            "Target Capital": self._strings[self.target_capital[index]],
+            "Target Country": self._strings[self.target_country[index]],
+            "Round Won": bool(self.round_won[index]),
+        }
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def _labels(self, column):
+        strings = self._strings
+        return [strings[i] for i in column]
+
+    def frame(self):
+        """
+        Cached DataFrame with one row per round; "Guess History" holds the guesses
+        joined into a readable string. Do not modify the returned frame.
+        """
+        if "rounds" not in self._frames:
+            # pandas is only needed by the stats page, so it is not imported with the game
+            import pandas as pd
+
+            guess_labels = self._labels(self.guess_text)
+            offsets = self.guess_offset
+            self._frames["rounds"] = pd.DataFrame({
+                "Round": pd.array(self.round_number, dtype="int32"),
+                "Guesses": pd.array(self.guesses, dtype="int32"),
+                "Non-Capitals": pd.array(self.non_capitals, dtype="int32"),
+                "Distance Off": pd.array(self.distance_off, dtype="float64"),
+                "Guess History": [", ".join(guess_labels[offsets[i]:offsets[i + 1]]) for i in range(len(self))],
+                "Target Capital": pd.Categorical(self._labels(self.target_capital)),
+                "Target Country": pd.Categorical(self._labels(self.target_country)),
+                "Round Won": pd.array(self.round_won, dtype="bool"),
+            })
+        return self._frames["rounds"]
+
+    def __getstate__(self):
+        # Cached frames are derived data
+        state = self.__dict__.copy()
+        state["_frames"] = {}
+        return state
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Build a store from legacy game_data dicts.
+        """
+        store = cls()
+        for record in records:
+            store.append_round(
+                record["Round"], record["Guesses"], record["Non-Capitals"], record["Distance Off"],
+                record["Target Capital"], record["Target Country"], record["Guess History"],
+            )
+        return store
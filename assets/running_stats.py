@@ -0,0 +1,50 @@
+import math
+
+
+class RunningStats:
+    """
+    Constant-time running aggregate: count, sum, mean, min/max and Welford variance.
+    """
+
+    __slots__ = ("count", "total", "mean", "minimum", "maximum", "_m2")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.mean = 0.0
+        self.minimum = None
+        self.maximum = None
+        self._m2 = 0.0
+
+    def push(self, value):
+        """
+        Add one observation.
+        """
+        self.count += 1
+        self.total += value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    @property
+    def variance(self):
+        """
+        Sample variance (0 until there are two observations).
+        """
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "mean": self.mean,
+            "min": self.minimum,
+            "max": self.maximum,
+            "variance": self.variance,
+        }
@@ -0,0 +1,30 @@
+import sqlite3
+import threading
+
+
+def thread_local_connection(path, timeout=5, isolation_level=None, synchronous=None):
+    """
+    Return a function giving each calling thread its own connection to `path`.
+
+    SQLite connections are not shared between threads, and Streamlit runs every
+    session in its own, so each thread opens one connection on first use (in WAL
+    mode, so readers never block the writer) and keeps it.
+
+    Args:
+        timeout (float): Seconds to wait for a lock held by another connection.
+        isolation_level (str): Passed to sqlite3.connect; None means autocommit.
+        synchronous (str): Optional PRAGMA synchronous value, e.g. "NORMAL".
+    """
+    local = threading.local()
+
+    def connection():
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(path, timeout=timeout, isolation_level=isolation_level)
+            conn.execute("PRAGMA journal_mode=WAL")
+            if synchronous:
+                conn.execute(f"PRAGMA synchronous={synchronous}")
+            local.conn = conn
+        return conn
+
+    return connection
@@ -0,0 +1,184 @@
+import json
+import re
+
+from assets.backends import is_valid_evaluation
+
+# Verdict fields that can be read as soon as their value has been generated
+_BOOLEAN_FIELD = re.compile(r'"(guess_correct|is_capital|valid_city)"\s*:\s*(true|false)')
+_DISTANCE_FIELD = re.compile(r'"distance_to_guess"\s*:\s*(null|-?\d+(?:\.\d+)?)\s*[,}\n]')
+_COMMENT_START = re.compile(r'"comment"\s*:\s*"')
+
+# Result of a stream that did not contain a usable evaluation
+PARSE_ERROR = {"error": "Failed to parse the response. Please try again.", "busy": False}
+
+
+class VerdictStreamParser:
+    """
+    Incremental parser for the evaluation JSON as it streams in.
+
+    Boolean verdict fields and the distance are exposed in `fields` the moment they
+    are complete, and the `comment` string is decoded piece by piece, so the UI can
+    react long before the closing brace arrives.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.fields = {}
+        self._comment_pos = None  # Index of the next unread comment character
+        self.comment = ""  # Comment text decoded so far
+        self.comment_done = False
+
+    def feed(self, chunk):
+        """
+        Add a chunk of model output.
+
+        Returns:
+            str: Newly decoded comment text (possibly empty).
+        """
+        self.text += chunk
+        for name, value in _BOOLEAN_FIELD.findall(self.text):
+            self.fields.setdefault(name, value == "true")
+        if "distance_to_guess" not in self.fields:
+            match = _DISTANCE_FIELD.search(self.text)
+            if match:
+                self.fields["distance_to_guess"] = None if match.group(1) == "null" else json.loads(match.group(1))
+        return self._read_comment()
+
+    def _read_comment(self):
+        if self.comment_done:
+            return ""
+        if self._comment_pos is None:
+            match = _COMMENT_START.search(self.text)
+            if not match:
+                return ""
+            self._comment_pos = match.end()
+
+        start = i = self._comment_pos
+        text = self.text
+        while i < len(text):
+            ch = text[i]
+            if ch == '"':
+                self.comment_done = True
+                break
+            if ch == "\\":
+                # Wait for the whole escape sequence before decoding it
+                width = 6 if text[i + 1:i + 2] == "u" else 2
+                if i + width > len(text):
+                    break
+                i += width
+                continue
+            i += 1
+        self._comment_pos = i + 1 if self.comment_done else i
+        # strict=False: models sometimes put raw newlines or tabs inside the string
+        try:
+            comment = json.loads(f'"{text[start:i]}"', strict=False)
+        except json.JSONDecodeError:
+            comment = text[start:i]  # An invalid escape is shown as written rather than failing the stream
+        self.comment += comment
+        return comment
+
+    def result(self):
+        """
+        The complete evaluation, falling back to the incrementally parsed fields
+        (and the comment decoded so far) if the full text is not valid JSON.
+
+        Raises:
+            json.JSONDecodeError: Neither the text nor the parsed fields hold a complete verdict.
+        """
+        try:
+            return json.loads(self.text, strict=False)
+        except json.JSONDecodeError:
+            result = dict(self.fields, comment=self.comment)
+            if not is_valid_evaluation(result):
+                raise
+            return result
+
+
+class EvaluationStream:
+    """
+    A guess evaluation that may still be arriving.
+
+    wait_for_verdict() returns as soon as the correct/incorrect verdict is known,
+    comment_chunks() yields the comment as it streams (for st.write_stream), and
+    result() returns the final evaluation dict.
+    """
+
+    def __init__(self, chunks=None, result=None, on_complete=None, on_error=None):
+        self._chunks = iter(chunks) if chunks is not None else None
+        self._parser = VerdictStreamParser()
+        self._pending_comment = []
+        self._result = result
+        self._on_complete = on_complete
+        self._on_error = on_error
+
+    @classmethod
+    def completed(cls, result):
+        """
+        Wrap an evaluation that is already known (local or cached).
+        """
+        return cls(result=result)
+
+    def _pull(self):
+        # Read one more chunk; returns False once the stream is exhausted
+        if self._chunks is None:
+            return False
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._chunks = None
+            return False
+        except Exception as e:
+            self._chunks = None
+            self._result = self._on_error(e) if self._on_error else {"error": str(e)}
+            return False
+        comment = self._parser.feed(chunk or "")
+        if comment:
+            self._pending_comment.append(comment)
+        return True
+
+    def wait_for_verdict(self):
+        """
+        Block until guess_correct is known and return the verdict fields seen so far,
+        or an error dict if the stream failed or ended without a verdict.
+        """
+        if self._result is not None:
+            return self._result
+        while "guess_correct" not in self._parser.fields and self._pull():
+            pass
+        if self._result is not None:
+            return self._result
+        if "guess_correct" not in self._parser.fields:
+            self._result = dict(PARSE_ERROR)
+            return self._result
+        return dict(self._parser.fields)
+
+    def comment_chunks(self):
+        """
+        Yield the comment text as it arrives.
+        """
+        if self._result is not None and self._chunks is None and not self._pending_comment:
+            yield self._result.get("comment", "")
+            return
+        while True:
+            while self._pending_comment:
+                yield self._pending_comment.pop(0)
+            if self._parser.comment_done or not self._pull():
+                break
+        while self._pending_comment:
+            yield self._pending_comment.pop(0)
+
+    def result(self):
+        """
+        Drain the stream and return the final evaluation dict.
+        """
+        while self._pull():
+            pass
+        if self._result is None:
+            try:
+                self._result = self._parser.result()
+            except json.JSONDecodeError:
+                self._result = dict(PARSE_ERROR)
+            else:
+                if self._on_complete:
+                    self._result = self._on_complete(self._result)
+        return self._result
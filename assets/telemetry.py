@@ -0,0 +1,193 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+from time import perf_counter
+
+import numpy as np
+
+# Prefix of every exported Prometheus metric
+METRIC_PREFIX = "guessing_game"
+
+
+def prometheus_value(value):
+    """
+    Format a sample value exactly: integers in full (large token counts would
+    lose digits in %g) and floats with repr(), which round-trips.
+    """
+    if isinstance(value, int):
+        return str(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Telemetry:
+    """
+    In-process latency spans, event counters and metric sources.
+
+    Each span keeps its call count, total time and the last `window` durations, so
+    percentiles reflect recent traffic. Counters are plain running totals (cache
+    hits, tokens, dollars). Components that already keep their own counters
+    (caches, the round pool) register a metrics() callable as a source instead of
+    reporting every event. Everything is thread-safe and cheap enough for hot paths.
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self._spans = {}
+        self._counters = {}
+        self._sources = {}
+        self._exporter = None
+
+    # --- RECORDING ---
+
+    def observe(self, name, seconds):
+        """
+        Record one duration for span `name`.
+        """
+        with self._lock:
+            span = self._spans.get(name)
+            if span is None:
+                span = self._spans[name] = [0, 0.0, deque(maxlen=self.window)]
+            span[0] += 1
+            span[1] += seconds
+            span[2].append(seconds)
+
+    def span(self, name):
+        """
+        Context manager timing the body of a with block.
+        """
+        return _Span(self, name)
+
+    def timed(self, name):
+        """
+        Decorator timing every call of a function.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def register_source(self, name, metrics):
+        """
+        Include the numeric values of metrics() in every snapshot under `name`.
+        """
+        with self._lock:
+            self._sources[name] = metrics
+
+    # --- READING ---
+
+    def snapshot(self):
+        """
+        Current spans (count, total and p50/p95/p99 in milliseconds), counters and sources.
+        """
+        with self._lock:
+            spans = {name: (count, total, list(samples)) for name, (count, total, samples) in self._spans.items()}
+            counters = dict(self._counters)
+            sources = dict(self._sources)
+        span_stats = {}
+        for name, (count, total, samples) in sorted(spans.items()):
+            p50, p95, p99 = np.percentile(np.asarray(samples) * 1000.0, [50, 95, 99])
+            span_stats[name] = {"count": count, "total_s": total, "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99)}
+        source_stats = {}
+        for name, metrics in sorted(sources.items()):
+            try:
+                values = metrics()
+            except Exception:
+                continue
+            source_stats[name] = {key: value for key, value in values.items() if isinstance(value, (int, float)) and not isinstance(value, bool)}
+        return {"time": time.time(), "spans": span_stats, "counters": dict(sorted(counters.items())), "sources": source_stats}
+
+    def prometheus_text(self, snapshot=None):
+        """
+        Snapshot in the Prometheus text exposition format.
+        """
+        snapshot = snapshot or self.snapshot()
+        lines = [f"# TYPE {METRIC_PREFIX}_span_seconds summary"]
+        for name, stats in snapshot["spans"].items():
+            for quantile in ("50", "95", "99"):
+                lines.append(f'{METRIC_PREFIX}_span_seconds{{span="{name}",quantile="0.{quantile}"}} {stats[f"p{quantile}_ms"] / 1000.0:.6g}')
+            lines.append(f'{METRIC_PREFIX}_span_seconds_count{{span="{name}"}} {stats["count"]}')
+            lines.append(f'{METRIC_PREFIX}_span_seconds_sum{{span="{name}"}} {stats["total_s"]:.6g}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_events_total counter")
+        for name, value in snapshot["counters"].items():
+            lines.append(f'{METRIC_PREFIX}_events_total{{event="{name}"}} {prometheus_value(value)}')
+        lines.append(f"# TYPE {METRIC_PREFIX}_component gauge")
+        for source, values in snapshot["sources"].items():
+            for name, value in values.items():
+                lines.append(f'{METRIC_PREFIX}_component{{source="{source}",metric="{name}"}} {prometheus_value(value)}')
+        return "\n".join(lines) + "\n"
+
+    # --- EXPORT ---
+
+    def export(self, jsonl_path=None, prometheus_path=None):
+        """
+        Append a snapshot to a JSON lines file and/or rewrite a Prometheus text file.
+        """
+        snapshot = self.snapshot()
+        if jsonl_path:
+            os.makedirs(os.path.dirname(jsonl_path) or ".", exist_ok=True)
+            with open(jsonl_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(snapshot) + "\n")
+        if prometheus_path:
+            # Written to a temporary file first so a scraper never reads half a file
+            os.makedirs(os.path.dirname(prometheus_path) or ".", exist_ok=True)
+            tmp_path = f"{prometheus_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text(snapshot))
+            os.replace(tmp_path, prometheus_path)
+
+    def start_exporter(self, interval=15.0, jsonl_path=None, prometheus_path=None):
+        """
+        Export every `interval` seconds from a daemon thread (once per process).
+        """
+        if self._exporter is not None or not (jsonl_path or prometheus_path):
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.export(jsonl_path, prometheus_path)
+                except OSError:
+                    pass
+
+        self._exporter = threading.Thread(target=loop, name="telemetry-exporter", daemon=True)
+        self._exporter.start()
+
+
+class _Span:
+    # A plain class rather than @contextmanager: spans sit on hot paths and generators cost more
+    __slots__ = ("telemetry", "name", "start")
+
+    def __init__(self, telemetry, name):
+        self.telemetry = telemetry
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.telemetry.observe(self.name, perf_counter() - self.start)
+
+
+# Process-wide instance used by the game modules
+TELEMETRY = Telemetry()
@@ -1,137 +1,271 @@
-import json
-from openai import OpenAI
-import streamlit as st
-import toml
-
-# Initialize the OpenAI client with the API key from the secrets file
-api_key = st.secrets["openai"]["api_key"]
-client = OpenAI(api_key=api_key)
-
-# fetch function that will get the requested data from the gpt-3.5-turbo model and provide it in JSON format
-def fetch_capitals():
-    """
-    Fetches details about two random capitals using the OpenAI API.
-    """
-    prompt = """
-    Provide a JSON object with the following details about two random capitals, 1 target capital, and 1 capital to be guessed:
-    - Name of the target_capital + its country.
-    - Name of the guess_capital + name of its country (you are allowed to mention the name of the capital and its country in this field)
-    - 4 fun facts about the guess_capital where you do not mention the guess_capital's name nor its country's name in this manner:
-        - 1. flight time between them in one sentence WITHOUT mentioning the guess capital's name nor its country. 
-        - 2. How many people live in it in one sentence WITHOUT mentioning the guess capital's name nor its country. 
-        - 3. When it was founded WITHOUT mentioning the guess capital's name nor its country.
-        - 4. Famous dish of the guess_capital WITHOUT mentioning the guess capital's name nor its country. 
-    - Distance between the two capitals in kilometers
-
-    Example:
-    {
-        "target_capital": {"name": "Tunis", "country": "Tunisia"},
-        "guess_capital": {"name": "Rome", "country": "Italy", "fun_facts": ["it would take you x hours to fly there.", "20 million people live there.", "it was founded in 1580.", "It is famous for its couscous."]},
-        "distance_km": 5837
-    }
-    """
-    try:
-        # Create a chat completion request
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a fact and geography expert and provide the requested data accurately and you don't favor popular capitals over others. The probability is even across all capitals. You do not reveal the name nor the country of the guess capital in the fun facts; you only reveal them in their appropriate field, which is guess_capital name and guess_capital country."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=  1.2  # for some randomness
-        )
-        # Extract and parse the response content
-        content = response.choices[0].message.content.strip()
-        return json.loads(content)
-    except json.JSONDecodeError:
-        return "We are experiencing a server issue, please try again."
-    except Exception as e:
-        return f"An error occurred: {e}"
-
-
-# Function that evaluates user input and compares it using GPT-3.5
-def evaluate_guess(city_details, user_guess):
-    """
-    Evaluate the user's guess in the context of the city game.
-
-    Args:
-        city_details (dict): Dictionary containing city details and distance information.
-        user_guess (str): The city guessed by the user.
-
-    Returns:
-        dict: Evaluation result including correctness, capital status, and distance.
-    """
-    # Construct the prompt for the OpenAI model
-    prompt = f"""
-Reference City: {city_details['target_capital']['name']}
-Correct City: {city_details['guess_capital']['name']}
-User Guess: {user_guess}
-
-Evaluate the user's guess following these instructions:
-- Normalize input for comparison: Treat New York the same as new york the same as NEW YORK etc. Uppercase and lowercase dont matter. 
-- Does the guess match the target_capital? 
-- Is the guess a capital of a country?
-- Is the guess an existing recognized city? 
-- If the city does not exist, return null.
-- If the city is a valid city (existing), then calculate the distance in kilometers from the target_city to the city the user guessed.
-- Give your comment on how well the player has been guessing, taking into account these criteria and your short feedback.
-- Never tell in which country the city is!
-- Provide the output in this JSON format:
-{{
-    "guess_correct": <true/false>,
-    "is_capital": <true/false>,
-    "valid_city": <true/false>,
-    "distance_to_guess": <distance or null>
-    "comment": "<string>"
-}}
-- Use 'null' for missing or inapplicable values for 'distance_to_guess'.
-- The 'comment' field should always be a string, even if empty (e.g., "").
-- All boolean values must be explicitly true or false.
-- When checking if a city is a capital, refer to its official status globally. And also, the capitalization of the letters do not play a role, for example, berlin is a capital, as well as Berlin. That holds true for cities as well. And if the given input provided can either be a capital city, non-capital city, an object, a name etc then check if it holds true in this order.
-- If input is not a city than do not count the distance off
-- If the user sends and input which is not a valid string (empty input, digits, emojis etc) - tell them that it is not correct and they said something funny and count it as a wrong guess"
-"""
-
-    try:
-        # Use the chat completion API
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a geography and distance expert that evaluates accurately if the user guess is a real city,  a capital, and how far is it from the  capital."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature = 0.2  # Set temperature for deterministic responses
-        )
-        # Extract and parse the response content
-        content = response.choices[0].message.content.strip()
-        result = json.loads(content)  # Parse JSON-like string into a Python dictionary
-
-        # Additional check: If the city is not valid, set the distance to None
-        if not result.get("valid_city", False):
-            result["distance_to_guess"] = None
-        return result
-
-    except json.JSONDecodeError:
-        return {"error": "Failed to parse the response. Please try again."}
-    except Exception as e:
-        return {"error": str(e)}
-
-def update_game_data():
-    if st.session_state.round_complete and st.session_state.guess_history:
-        st.session_state.game_data.append({
-            "Round": st.session_state.round_number - 1,
-            "Guesses": st.session_state.guesses_this_round,
-            "Non-Capitals": st.session_state.non_capitals_this_round,
-            "Distance Off": st.session_state.distance_off_this_round,
-            "Guess History": st.session_state.guess_history,
-            "Target Capital": st.session_state.current_round["guess_capital"]["name"],
-            "Target Country": st.session_state.current_round["guess_capital"]["country"],
-            "Round Won": any(guess["Correct"] for guess in st.session_state.guess_history),
-        })
-
-
-        
-def display_hint():
-    st.info(f"Hint: {st.session_state.hints[st.session_state.hint_index]}")
-    st.session_state.hint_index += 1
-
+import json
+import os
+import re
+import streamlit as st
+from assets.gazetteer import evaluate_locally, normalize_name
+from assets.cache import EvaluationCache, cache_key
+from assets.history_db import HistoryDB
+from assets.round_catalog import RoundCatalog
+from assets.hint_store import HintStore
+from assets.round_pool import RoundPool
+from assets.rooms import RoomEngine
+from assets.streaming import EvaluationStream
+from assets.backends import create_backend, is_valid_evaluation, is_valid_round
+from assets.dispatcher import DispatchError
+from assets.engine import archive_round, next_hint
+from assets.telemetry import TELEMETRY
+
+
+# Read an optional section of the secrets file, tolerating a missing file
+def get_setting(section, default=None):
+    try:
+        return dict(st.secrets.get(section, default or {}))
+    except FileNotFoundError:
+        return dict(default or {})
+
+
+# The LLM backend, created lazily once per server process.
+# GUESSING_GAME_BACKEND (or kind under [backend] in the secrets file) selects
+# "openai" (default), "fake", "record" or "replay"; the other [backend] keys are
+# passed to the backend. OpenAI backends, including one wrapped by record/replay, read their key from [openai].
+@st.cache_resource
+def get_backend():
+    settings = get_setting("backend")
+    kind = os.environ.get("GUESSING_GAME_BACKEND") or settings.pop("kind", "openai")
+    settings.pop("kind", None)
+    return create_backend(kind, openai_api_key=get_setting("openai").get("api_key"), **settings)
+
+# Shared cache of model evaluations, one per server process (tunable via an optional [evaluation_cache] secrets section)
+@st.cache_resource
+def get_evaluation_cache():
+    cache = EvaluationCache(**get_setting("evaluation_cache"))
+    TELEMETRY.register_source("evaluation_cache", cache.metrics)
+    return cache
+
+# Durable cross-session stats store, one per server process (tunable via an optional [history_db] secrets section)
+@st.cache_resource
+def get_history_db():
+    history_db = HistoryDB(**get_setting("history_db"))
+    TELEMETRY.register_source("history_db", history_db.metrics)
+    return history_db
+
+# Precomputed rounds between every pair of capitals, one per server process.
+# An optional [round_catalog] section sets directory, band (near, regional, far, remote) and seed.
+@st.cache_resource
+def get_round_catalog():
+    return RoundCatalog(**get_setting("round_catalog"))
+
+# Leak-checked fun facts per capital, one store per server process (tunable via an optional [hint_store] secrets section)
+@st.cache_resource
+def get_hint_store():
+    hint_store = HintStore(**get_setting("hint_store"))
+    TELEMETRY.register_source("hint_store", hint_store.metrics)
+    return hint_store
+
+# Fun facts about a capital: a lookup in the hint store, asking the model only for capitals the batch job has not filled
+def get_fun_facts(name, country):
+    try:
+        return get_hint_store().hints_for(name, country, get_backend().fetch_fun_facts)
+    except Exception:
+        return []
+
+# One pool of prefetched rounds per server process, shared by all sessions and rooms.
+# Tunable via an optional [round_pool] section (capacity, low_water, max_workers, batch_size) in the secrets file.
+@st.cache_resource
+def get_round_pool():
+    pool = RoundPool(fetch_capitals_batch, validate=is_valid_round, **get_setting("round_pool"))
+    pool.refill()
+    TELEMETRY.register_source("round_pool", pool.metrics)
+    return pool
+
+# Multiplayer rooms, one registry per server process (max_players, idle_timeout and host_timeout via an optional [rooms] section)
+@st.cache_resource
+def get_room_engine():
+    engine = RoomEngine(
+        next_round=lambda: get_round_pool().take(),
+        evaluate=lambda round_data, guess: evaluate_guess(round_data, guess.upper()),
+        on_round_complete=lambda history_id, player_name, round_data: get_history_db().record_round(history_id, round_data, player_name),
+        **get_setting("rooms"),
+    )
+    TELEMETRY.register_source("rooms", engine.metrics)
+    return engine
+
+# Periodic telemetry export, started once per server process.
+# An optional [telemetry] section sets jsonl_path and/or prometheus_path (nothing is written without one) and interval in seconds.
+@st.cache_resource
+def start_telemetry_export():
+    settings = get_setting("telemetry")
+    TELEMETRY.start_exporter(
+        interval=float(settings.get("interval", 15.0)),
+        jsonl_path=settings.get("jsonl_path"),
+        prometheus_path=settings.get("prometheus_path"),
+    )
+    return TELEMETRY
+
+# Fills the round pool from the precomputed round catalog
+@TELEMETRY.timed("fetch_capitals_batch")
+def fetch_capitals_batch(count):
+    """
+    Samples `count` rounds from the round catalog.
+
+    Pairs and distances come from the precomputed catalog (no completion needed);
+    only the fun facts of a capital seen for the first time are asked from the model.
+    If the catalog cannot be loaded (no gazetteer, unwritable cache directory), whole
+    rounds are asked from the model instead with the backend's batched round request.
+
+    Args:
+        count (int): Number of rounds to sample.
+
+    Returns:
+        list: The rounds (the model fallback may return fewer, or raise).
+    """
+    try:
+        catalog = get_round_catalog()
+    except Exception:
+        TELEMETRY.count("rounds.model_fallback")
+        return get_backend().fetch_rounds(count)
+    return [catalog.make_round(fun_facts=get_fun_facts) for _ in range(count)]
+
+
+# Function that evaluates user input, locally when possible and with the LLM backend otherwise
+@TELEMETRY.timed("evaluate_guess")
+def evaluate_guess(city_details, user_guess):
+    """
+    Evaluate the user's guess in the context of the city game.
+
+    Guesses found in the bundled gazetteer (by name, alias or a close typo) are
+    answered locally (validity, capital status and haversine distance to the
+    correct capital); only unresolved input is sent to the model, and their answers are cached on the normalized
+    (reference city, correct city, guess) triple.
+
+    Args:
+        city_details (dict): Dictionary containing city details and distance information.
+        user_guess (str): The city guessed by the user.
+
+    Returns:
+        dict: Evaluation result including correctness, capital status, and distance.
+    """
+    local_result = evaluate_locally(city_details, user_guess)
+    if local_result is not None:
+        TELEMETRY.count("evaluations.local")
+        return local_result
+
+    cache = get_evaluation_cache()
+    key = evaluation_cache_key(city_details, user_guess)
+    cached_result = cache.get(key)
+    if cached_result is not None:
+        TELEMETRY.count("evaluations.cached")
+        return cached_result
+
+    TELEMETRY.count("evaluations.model")
+    try:
+        result = get_backend().evaluate(city_details, user_guess)
+        return finish_evaluation(result, cache, key)
+
+    except json.JSONDecodeError:
+        return {"error": "Failed to parse the response. Please try again."}
+    except Exception as e:
+        return error_result(e)
+
+
+# Error value for an evaluation that could not be made; "busy" marks requests refused by the dispatcher's limits
+def error_result(error):
+    return {"error": str(error), "busy": isinstance(error, DispatchError) and error.busy}
+
+
+def evaluation_cache_key(city_details, user_guess):
+    return cache_key(
+        normalize_name(city_details['target_capital']['name']),
+        normalize_name(city_details['guess_capital']['name']),
+        normalize_name(user_guess),
+    )
+
+
+def finish_evaluation(result, cache, key):
+    # Malformed answers are neither recorded nor cached, so they cannot replay to every worker
+    if not is_valid_evaluation(result):
+        return {"error": "Failed to parse the response. Please try again."}
+    # Additional check: If the city is not valid, set the distance to None
+    if not result["valid_city"]:
+        result["distance_to_guess"] = None
+    cache.set(key, result)
+    return result
+
+
+# Streaming variant of evaluate_guess: the verdict and comment can be shown while the model is still writing
+def stream_guess_evaluation(city_details, user_guess):
+    """
+    Evaluate the user's guess, streaming the model's answer when one is needed.
+
+    Local and cached evaluations are returned as already-completed streams.
+
+    Args:
+        city_details (dict): Dictionary containing city details and distance information.
+        user_guess (str): The city guessed by the user.
+
+    Returns:
+        EvaluationStream: Call wait_for_verdict(), comment_chunks() and result() on it.
+    """
+    local_result = evaluate_locally(city_details, user_guess)
+    if local_result is not None:
+        TELEMETRY.count("evaluations.local")
+        return EvaluationStream.completed(local_result)
+
+    cache = get_evaluation_cache()
+    key = evaluation_cache_key(city_details, user_guess)
+    cached_result = cache.get(key)
+    if cached_result is not None:
+        TELEMETRY.count("evaluations.cached")
+        return EvaluationStream.completed(cached_result)
+
+    TELEMETRY.count("evaluations.model")
+    try:
+        chunks = get_backend().stream_evaluation(city_details, user_guess)
+    except Exception as e:
+        # Backend creation fails without an API key or with a bad [backend] setting
+        return EvaluationStream.completed(error_result(e))
+    return EvaluationStream(
+        chunks,
+        on_complete=lambda result: finish_evaluation(result, cache, key),
+        on_error=error_result,
+    )
+
+# Player ids as made by engine.initialize_state (uuid4 hex)
+PLAYER_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+# Keep the player id in the page URL (?player=...) so a bookmarked link can lead back to the
+# same player in the stats store. An id arriving in a link is only offered (see offer_resume),
+# never adopted silently: a link shared by someone else would file this session's rounds under their id
+def remember_player():
+    player_id = st.query_params.get("player")
+    if player_id and player_id != st.session_state.player_id and PLAYER_ID_PATTERN.fullmatch(player_id):
+        st.session_state.pending_player_id = player_id
+    st.query_params["player"] = st.session_state.player_id
+
+def resume_player(resume):
+    if resume:
+        st.session_state.player_id = st.session_state.pending_player_id
+        st.query_params["player"] = st.session_state.player_id
+    st.session_state.pending_player_id = None
+
+# Ask before switching to the player id from a ?player= link
+def offer_resume():
+    if st.session_state.get("pending_player_id"):
+        st.info("This link carries the stats of an earlier session. Resume them only if it is your own bookmark.")
+        col1, col2 = st.columns(2)
+        col1.button("Resume my stats", on_click=resume_player, args=(True,))
+        col2.button("Start fresh", on_click=resume_player, args=(False,))
+
+# Save the completed round to the session's game data and queue it for the durable stats store
+def update_game_data():
+    if archive_round(st.session_state):
+        round_data = st.session_state.game_data[-1]
+        round_data["Reference City"] = st.session_state.current_round["target_capital"]["name"]
+        get_history_db().record_round(st.session_state.player_id, round_data, st.session_state.player_name)
+
+
+# Show the next hint for the current round, if any are left
+def display_hint():
+    hint = next_hint(st.session_state)
+    if hint is not None:
+        st.info(f"Hint: {hint}")
@@ -0,0 +1,231 @@
+"""
+Headless load test for the game loop.
+
+Drives the same round lifecycle as play.py (start_new_round, evaluate_guess_and_provide_feedback,
+update_game_data) through assets.engine against the offline FakeBackend, for thousands of
+simulated sessions running concurrently. Reports p50/p95/p99 latency per operation, throughput and
+memory per session, and compares the run against a saved baseline.
+
+Usage (from the repository root):
+    python -m bench.bench_game                      # run and compare with the baseline
+    python -m bench.bench_game --save-baseline      # run and overwrite the baseline
+    python -m bench.bench_game --sessions 5000 --latency 0.05
+"""
+import argparse
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from assets import utils
+from assets.backends import FakeBackend
+from assets.cache import EvaluationCache
+from assets.engine import CORRECT, archive_round, begin_round, initialize_state, next_hint, record_guess
+from assets.gazetteer import load_gazetteer
+from assets.hint_store import HintStore
+from assets.round_catalog import RoundCatalog
+from assets.round_pool import RoundPool
+from bench.common import add_baseline_arguments, check_baseline, regressions
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "game_loop.json")
+P95_FLOOR_MS = 1.0  # Smallest p95 increase (ms) reported as a regression
+
+# Operations named after the play.py functions they stand for
+OPERATIONS = ("start_new_round", "evaluate_guess_and_provide_feedback", "update_game_data")
+
+# Guesses that are not in the gazetteer, so they take the cache and backend path
+UNKNOWN_GUESSES = ["Atlantis", "Gotham", "El Dorado", "Shangri-La", "Springfield", "Metropolis"]
+
+
+class Recorder:
+    """
+    Collects latency samples per operation; list.append is atomic, so threads can share it.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def timed(self, operation, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.samples[operation].append(time.perf_counter() - start)
+        return result
+
+
+def choose_guess(strategy, rng, state, attempt, max_guesses):
+    """
+    Next guess for a scripted player.
+
+    - oracle: always right on the first try.
+    - explorer: random capitals, then the answer once max_guesses is reached.
+    - mixed: like explorer, but also types unknown places and non-capital cities.
+    """
+    answer = state["current_round"]["guess_capital"]["name"]
+    if strategy == "oracle" or attempt >= max_guesses - 1:
+        return answer
+    gazetteer = load_gazetteer()
+    if strategy == "mixed":
+        roll = rng.random()
+        if roll < 0.2:
+            return rng.choice(UNKNOWN_GUESSES)
+        if roll < 0.4:
+            return gazetteer.names[rng.choice(np.flatnonzero(~gazetteer.is_capital))]
+    return gazetteer.names[rng.choice(np.flatnonzero(gazetteer.is_capital))]
+
+
+def play_session(session_id, args, pool, recorder):
+    """
+    Play `args.rounds` rounds in one simulated session and return its state.
+    """
+    rng = random.Random(args.seed + session_id)
+    strategy = args.strategies[session_id % len(args.strategies)]
+    state = {}
+    initialize_state(state)
+    state["start_playing_clicked"] = True
+
+    for _ in range(args.rounds):
+        recorder.timed("update_game_data", archive_round, state)
+        recorder.timed("start_new_round", lambda: begin_round(state, pool.take()))
+        for attempt in range(args.max_guesses):
+            guess = choose_guess(strategy, rng, state, attempt, args.max_guesses)
+
+            def evaluate_and_feedback():
+                evaluation = utils.evaluate_guess(state["current_round"], guess.upper())
+                outcome = record_guess(state, guess, evaluation)
+                next_hint(state)
+                return outcome
+
+            if recorder.timed("evaluate_guess_and_provide_feedback", evaluate_and_feedback) == CORRECT:
+                break
+    recorder.timed("update_game_data", archive_round, state)
+    return state
+
+
+def install_stubs(args, cache_dir):
+    """
+    Route assets.utils to an offline backend and throwaway caches, round catalog and hint store.
+    """
+    backend = FakeBackend(seed=args.seed, latency=args.latency)
+    cache = EvaluationCache(path=os.path.join(cache_dir, "evaluations.sqlite3"))
+    catalog = RoundCatalog(directory=cache_dir, seed=args.seed)
+    utils.get_backend = lambda: backend
+    utils.get_evaluation_cache = lambda: cache
+    utils.get_round_catalog = lambda: catalog
+    hint_store = HintStore(path=os.path.join(cache_dir, "hints.sqlite3"))
+    utils.get_hint_store = lambda: hint_store
+    return cache
+
+
+def measure_memory(args, pool, sample):
+    """
+    Average bytes retained per finished session, measured with tracemalloc on a sequential sample.
+    """
+    recorder = Recorder()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    states = [play_session(args.sessions + i, args, pool, recorder) for i in range(sample)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    del states
+    return retained / sample
+
+
+def run(args):
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = install_stubs(args, cache_dir)
+        pool = RoundPool(utils.fetch_capitals_batch, validate=utils.is_valid_round,
+                         capacity=args.pool_capacity, low_water=args.pool_capacity // 2, batch_size=8)
+        pool.refill()
+        recorder = Recorder()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(lambda i: play_session(i, args, pool, recorder), range(args.sessions)))
+        elapsed = time.perf_counter() - start
+
+        memory_per_session = measure_memory(args, pool, args.memory_sample)
+        pool.shutdown()
+
+        operations = {}
+        for operation in OPERATIONS:
+            samples_ms = np.asarray(recorder.samples[operation]) * 1000.0
+            p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+            operations[operation] = {
+                "count": int(samples_ms.size),
+                "p50_ms": round(float(p50), 4),
+                "p95_ms": round(float(p95), 4),
+                "p99_ms": round(float(p99), 4),
+            }
+        total_ops = sum(op["count"] for op in operations.values())
+        return {
+            "config": {key: value for key, value in vars(args).items() if key not in ("save_baseline", "baseline", "tolerance")},
+            "environment": {"python": platform.python_version(), "machine": platform.machine()},
+            "elapsed_s": round(elapsed, 3),
+            "sessions_per_s": round(args.sessions / elapsed, 2),
+            "operations_per_s": round(total_ops / elapsed, 2),
+            "memory_per_session_bytes": int(memory_per_session),
+            "operations": operations,
+            "round_pool": pool.metrics(),
+            "evaluation_cache": cache.metrics(),
+        }
+
+
+def compare(result, baseline, tolerance):
+    """
+    Return a list of regressions: p95 latencies or memory per session above baseline * (1 + tolerance).
+    p95 latencies must also be P95_FLOOR_MS above the baseline, as sub-millisecond
+    timings swing by more than the tolerance from run to run.
+    """
+    found = []
+    for operation, stats in result["operations"].items():
+        found += regressions(operation, stats, baseline["operations"].get(operation, {}), ["p95_ms"], tolerance,
+                             min_delta=P95_FLOOR_MS)
+    return found + regressions("session", result, baseline, ["memory_per_session_bytes"], tolerance)
+
+
+def print_report(result):
+    print(f"{result['config']['sessions']} sessions in {result['elapsed_s']} s "
+          f"({result['sessions_per_s']} sessions/s, {result['operations_per_s']} ops/s)")
+    print(f"memory per session: {result['memory_per_session_bytes'] / 1024:.1f} KiB")
+    print(f"{'operation':<40}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for operation, stats in result["operations"].items():
+        print(f"{operation:<40}{stats['count']:>8}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}{stats['p99_ms']:>10.3f}")
+    print(f"round pool: {result['round_pool']}")
+    print(f"evaluation cache: {result['evaluation_cache']}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=2000, help="number of simulated sessions")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds played per session")
+    parser.add_argument("--max-guesses", type=int, default=6, help="guesses before a player types the answer")
+    parser.add_argument("--concurrency", type=int, default=32, help="sessions played at the same time")
+    parser.add_argument("--strategies", nargs="+", default=["oracle", "explorer", "mixed"],
+                        choices=["oracle", "explorer", "mixed"], help="guess strategies, assigned round-robin")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of latency injected per backend call")
+    parser.add_argument("--pool-capacity", type=int, default=64, help="round pool capacity")
+    parser.add_argument("--memory-sample", type=int, default=200, help="sessions measured for memory use")
+    parser.add_argument("--seed", type=int, default=0)
+    add_baseline_arguments(parser, BASELINE_PATH)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    result = run(args)
+    print_report(result)
+    return check_baseline(result, args, compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Cold start benchmark for the Streamlit pages.
+
+Every sample runs one page for the first time in a fresh Python process (through
+streamlit's AppTest, against the offline FakeBackend) and records the time of that
+first script run, the resident memory it added and which heavy modules it pulled in.
+The first run stands in for time-to-first-paint: it covers the page's imports,
+the creation of shared resources and the script itself. Medians are compared
+against a saved baseline.
+
+Usage (from the repository root):
+    python -m bench.bench_startup                   # run and compare with the baseline
+    python -m bench.bench_startup --save-baseline   # run and overwrite the baseline
+    python -m bench.bench_startup --runs 10
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from bench.common import add_baseline_arguments, check_baseline, regressions
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "startup.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PAGES = ("play.py", "pages/stats.py")
+
+# Modules worth keeping off the cold path
+HEAVY_MODULES = ("pandas", "matplotlib", "openai", "pyarrow")
+
+
+def rss_mb():
+    # Peak resident set size of this process (ru_maxrss is in KiB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def isolated_settings(cache_dir):
+    """
+    Secrets sections pointing every on-disk store of the app into `cache_dir`.
+    """
+    return {
+        "evaluation_cache": {"path": os.path.join(cache_dir, "evaluations.sqlite3")},
+        "history_db": {"path": os.path.join(cache_dir, "history.sqlite3")},
+        "hint_store": {"path": os.path.join(cache_dir, "hints.sqlite3")},
+        "round_catalog": {"directory": cache_dir},
+    }
+
+
+def child(page, cache_dir):
+    """
+    Run `page` once in this (fresh) process and print the measurements as JSON.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    harness_rss = rss_mb()
+    start = time.perf_counter()
+    app = AppTest.from_file(os.path.join(ROOT, page), default_timeout=60)
+    for section, settings in isolated_settings(cache_dir).items():
+        app.secrets[section] = settings
+    app.run()
+    first_run = time.perf_counter() - start
+    print(json.dumps({
+        "first_run_ms": first_run * 1000.0,
+        "rss_mb": rss_mb() - harness_rss,
+        "heavy_modules": [name for name in HEAVY_MODULES if name in sys.modules],
+        "exception": bool(app.exception),
+    }))
+    sys.stdout.flush()
+    # Skip joining the round pool's background threads
+    os._exit(0)
+
+
+def sample(page):
+    env = dict(os.environ, GUESSING_GAME_BACKEND="fake")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        output = subprocess.run(
+            [sys.executable, "-m", "bench.bench_startup", "--child", page, "--cache-dir", cache_dir],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(args):
+    pages = {}
+    for page in args.pages:
+        samples = [sample(page) for _ in range(args.runs)]
+        pages[page] = {
+            "first_run_ms": round(float(np.median([s["first_run_ms"] for s in samples])), 2),
+            "rss_mb": round(float(np.median([s["rss_mb"] for s in samples])), 2),
+            "heavy_modules": samples[-1]["heavy_modules"],
+            "exceptions": sum(s["exception"] for s in samples),
+        }
+    return {
+        "config": {"runs": args.runs, "pages": list(args.pages)},
+        "environment": {"python": platform.python_version(), "machine": platform.machine()},
+        "pages": pages,
+    }
+
+
+def compare(result, baseline, tolerance):
+    """
+    Return a list of regressions: median first run or memory above baseline * (1 + tolerance).
+    """
+    found = []
+    for page, stats in result["pages"].items():
+        found += regressions(page, stats, baseline["pages"].get(page, {}), ["first_run_ms", "rss_mb"], tolerance)
+    return found
+
+
+def print_report(result):
+    print(f"median of {result['config']['runs']} cold starts per page")
+    print(f"{'page':<20}{'first run ms':>14}{'RSS MB':>10}  heavy modules")
+    for page, stats in result["pages"].items():
+        print(f"{page:<20}{stats['first_run_ms']:>14.1f}{stats['rss_mb']:>10.1f}  {', '.join(stats['heavy_modules']) or '-'}")
+        if stats["exceptions"]:
+            print(f"  {stats['exceptions']} run(s) raised an exception")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="cold starts per page")
+    parser.add_argument("--pages", nargs="+", default=list(PAGES), help="pages to start, relative to the repository root")
+    add_baseline_arguments(parser, BASELINE_PATH)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--cache-dir", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        child(args.child, args.cache_dir)
+    result = run(args)
+    print_report(result)
+    return check_baseline(result, args, compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
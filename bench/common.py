@@ -0,0 +1,62 @@
+"""
+Baseline handling shared by the benchmarks: the --baseline, --save-baseline and
+--tolerance options, the regression check and saving or comparing a run.
+"""
+import json
+import os
+
+
+def add_baseline_arguments(parser, baseline_path):
+    parser.add_argument("--baseline", default=baseline_path, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative regression before failing")
+
+
+def regressions(label, current, reference, metrics, tolerance, min_delta=0.0):
+    """
+    One message per metric of `current` above reference * (1 + tolerance) and more
+    than `min_delta` above the reference, so noise on tiny values cannot trip the
+    relative check; metrics missing from the reference are skipped.
+    """
+    found = []
+    for metric in metrics:
+        if (reference.get(metric) and current[metric] > reference[metric] * (1 + tolerance)
+                and current[metric] - reference[metric] > min_delta):
+            found.append(f"{label} {metric} {current[metric]:.3f} > baseline {reference[metric]:.3f}")
+    return found
+
+
+def check_baseline(result, args, compare):
+    """
+    Save `result` as the baseline (--save-baseline) or compare it with the saved one.
+
+    Args:
+        compare (callable): compare(result, baseline, tolerance) returning regression messages.
+
+    Runs with a different "config" than the baseline measure something else, so they
+    are not compared.
+
+    Returns:
+        int: Exit status, 1 if a regression was found, 2 if the configs differ.
+    """
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+            f.write("\n")
+        print(f"baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against; run with --save-baseline")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != result["config"]:
+        print(f"config differs from the baseline ({baseline.get('config')}); not comparing. "
+              "Rerun with the baseline's options or save a new baseline")
+        return 2
+    found = compare(result, baseline, args.tolerance)
+    for regression in found:
+        print(f"REGRESSION: {regression}")
+    return 1 if found else 0
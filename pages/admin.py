@@ -0,0 +1,55 @@
+import streamlit as st
+from assets.utils import get_setting
+from assets.telemetry import TELEMETRY
+
+# --- PAGE CONFIGURATION ---
+# Configure Streamlit page with title, icon, and wide layout
+st.set_page_config(page_title="Admin", page_icon="🛠️", layout="wide")
+
+# --- ADMIN PAGE FUNCTION ---
+# Live latency and counter view of this server process; only shown with admin_page = true under [telemetry]
+def admin_page():
+    st.title("🛠️ Telemetry")
+    if not get_setting("telemetry").get("admin_page", False):
+        st.info("The admin page is disabled. Set admin_page = true under [telemetry] in the secrets file to enable it.")
+        return
+
+    # pandas is only needed once the page is enabled, so a disabled page does not pay for the import
+    import pandas as pd
+
+    snapshot = TELEMETRY.snapshot()
+    st.button("Refresh")
+
+    # --- LATENCY ---
+    st.write("### Latency (recent calls)")
+    if snapshot["spans"]:
+        spans = pd.DataFrame.from_dict(snapshot["spans"], orient="index")
+        spans = spans[["count", "p50_ms", "p95_ms", "p99_ms", "total_s"]].sort_values("p95_ms", ascending=False)
+        st.dataframe(spans.style.format({"p50_ms": "{:.2f}", "p95_ms": "{:.2f}", "p99_ms": "{:.2f}", "total_s": "{:.2f}"}), use_container_width=True)
+    else:
+        st.warning("Nothing has been timed yet.")
+
+    # --- COUNTERS ---
+    counters = snapshot["counters"]
+    st.write("### Model usage")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Requests", int(counters.get("openai.requests", 0)))
+    col2.metric("Prompt Tokens", int(counters.get("openai.prompt_tokens", 0)))
+    col3.metric("Completion Tokens", int(counters.get("openai.completion_tokens", 0)))
+    col4.metric("Cost (USD)", f"{counters.get('openai.cost_usd', 0.0):.4f}")
+
+    st.write("### Evaluations")
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Local", int(counters.get("evaluations.local", 0)))
+    col2.metric("Cached", int(counters.get("evaluations.cached", 0)))
+    col3.metric("Model", int(counters.get("evaluations.model", 0)))
+
+    # --- COMPONENTS ---
+    for source, values in snapshot["sources"].items():
+        st.write(f"### {source.replace('_', ' ').title()}")
+        st.dataframe(pd.DataFrame([values]), use_container_width=True, hide_index=True)
+
+    with st.expander("Prometheus export"):
+        st.code(TELEMETRY.prometheus_text(snapshot), language="text")
+
+admin_page()
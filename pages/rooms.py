@@ -0,0 +1,148 @@
+import uuid
+import streamlit as st
+from assets.engine import initialize_state, CORRECT, NO_DISTANCE
+from assets.gazetteer import looks_like_place_name
+from assets.rooms import RoomError
+from assets.utils import get_room_engine, remember_player
+
+# --- PAGE CONFIGURATION ---
+# Configure the Streamlit page with title and icon
+st.set_page_config(page_title="Rooms", page_icon="🌍")
+
+# --- INITIALIZE SESSION STATE ---
+# The room engine keeps the game state; the session only remembers which room it is in
+initialize_state(st.session_state)
+remember_player()
+# Other players see a prefix of the id used in rooms, so it is a fresh one per session rather than
+# the player id that links this player's stats; rounds are still archived under the player id
+st.session_state.setdefault("room_player_id", uuid.uuid4().hex)
+st.session_state.setdefault("room_code", None)
+st.session_state.setdefault("room_error", None)
+
+room_engine = get_room_engine()
+
+# --- ROOM ACTIONS ---
+def create_room():
+    st.session_state.room_code = room_engine.create_room(
+        st.session_state.room_player_id, st.session_state.player_name, history_id=st.session_state.player_id
+    )
+
+def join_room():
+    code = st.session_state.room_code_input.strip().upper()
+    try:
+        room_engine.join(code, st.session_state.room_player_id, st.session_state.player_name, history_id=st.session_state.player_id)
+        st.session_state.room_code = code
+    except RoomError as e:
+        st.session_state.room_error = str(e)
+
+def leave_room():
+    try:
+        room_engine.leave(st.session_state.room_code, st.session_state.room_player_id)
+    except RoomError:
+        pass
+    st.session_state.room_code = None
+
+def start_round():
+    with st.spinner("Preparing a new round..."):
+        try:
+            if not room_engine.start_round(st.session_state.room_code, st.session_state.room_player_id):
+                st.session_state.room_error = "We are experiencing a server issue, please try again."
+        except RoomError as e:
+            st.session_state.room_error = str(e)
+
+# --- EVALUATE GUESS ---
+# Evaluates the guess through the room engine and shows the verdict, comment and next hint
+def submit_guess(guess):
+    with st.spinner("Evaluating your guess..."):
+        result = room_engine.submit_guess(st.session_state.room_code, st.session_state.room_player_id, guess)
+    if result is None:
+        st.info("This round is already over for you.")
+        return
+    evaluation = result["evaluation"]
+    if result["outcome"] is None:
+        if evaluation.get("busy"):
+            st.warning("Lots of players right now! Please submit your guess again in a moment.")
+        else:
+            st.error("We are experiencing a server issue, please try again.")
+        return
+    if result["outcome"] == CORRECT:
+        st.success("Congrats! That's correct.")
+    else:
+        st.error("Try again!")
+    st.write(evaluation["comment"])
+    if result["outcome"] == NO_DISTANCE:
+        st.warning("Distance could not be calculated.")
+    if result["hint"] is not None:
+        st.info(f"Hint: {result['hint']}")
+
+# --- SCOREBOARD ---
+# Refreshes on its own every two seconds without rerunning the page, and tells the room engine this
+# player is still here. The whole page only reruns once the host has dealt a new round, so the guess
+# form can switch to it, or the host role has moved, so the host buttons follow it
+@st.fragment(run_every=2)
+def scoreboard(room, shown_round, shown_host):
+    try:
+        room_engine.touch(room.code, st.session_state.room_player_id)
+    except RoomError:
+        st.rerun()
+    if room.round_number != shown_round or room.host_id != shown_host:
+        st.rerun()
+    st.write("### Scoreboard")
+    rows = room.scoreboard()
+    if rows:
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+
+# --- USER INTERFACE ---
+def lobby():
+    st.title("Play with friends")
+    st.write("Everyone in a room guesses the same capital. Create a room and share its code, or join one.")
+    player_name = st.text_input("Your name:", value=st.session_state.player_name)
+    st.session_state.player_name = player_name.strip()[:30]
+    st.button("Create a Room", on_click=create_room)
+    st.text_input("Room code:", key="room_code_input", max_chars=8)
+    st.button("Join Room", on_click=join_room)
+
+def room_page(room):
+    is_host = room.host_id == st.session_state.room_player_id
+    st.title(f"Room {room.code}")
+    st.caption(f"{len(room.players)} player(s) · share the code {room.code} to invite others")
+
+    player = room_engine.player_state(room.code, st.session_state.room_player_id)
+    current_round = player["current_round"]
+    if current_round is None:
+        st.write("Waiting for the host to start the first round." if not is_host else "Start the first round when everyone is here.")
+    else:
+        reference = current_round["target_capital"]
+        st.write(f"### Round {room.round_number}: guess which capital is {current_round['distance_km']} km away from {reference['name']}, {reference['country']}.")
+        if player["round_complete"]:
+            st.success(f"You found it in {player['guesses_this_round']} guess(es)! Waiting for the next round.")
+        else:
+            with st.form("guess_form", clear_on_submit=True):
+                user_guess = st.text_input("Enter your guess:").strip()
+                submitted = st.form_submit_button("Submit")
+            if submitted:
+                if not user_guess:
+                    st.warning("Guess cannot be empty.")
+                elif not looks_like_place_name(user_guess):
+                    st.error("Invalid guess. Please enter a valid word.")
+                else:
+                    submit_guess(user_guess)
+
+    if is_host:
+        st.button("Start Round" if current_round is None else "Next Round", on_click=start_round)
+    st.button("Leave Room", on_click=leave_room)
+    scoreboard(room, room.round_number, room.host_id)
+
+if st.session_state.room_error:
+    st.error(st.session_state.room_error)
+    st.session_state.room_error = None
+
+if st.session_state.room_code is None:
+    lobby()
+else:
+    try:
+        room_page(room_engine.get(st.session_state.room_code))
+    except RoomError:
+        st.session_state.room_code = None
+        st.warning("This room has closed.")
+        lobby()
@@ -1,52 +1,65 @@
+import time
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
+from assets.engine import initialize_state
+from assets.history_db import LEADERBOARD_MIN_ROUNDS
+from assets.utils import get_history_db, remember_player, offer_resume
+from assets.telemetry import TELEMETRY
+
+# Start of this script run, for the rerun latency span recorded at the bottom of the page
+rerun_started = time.perf_counter()
 
 # --- PAGE CONFIGURATION ---
 # Configure Streamlit page with title, icon, and wide layout
 st.set_page_config(page_title="Game Stats", page_icon="📊", layout="wide")
 
+# --- ROUND TABLE ---
+# Builds the formatted round table used by the charts and the detailed view
+@TELEMETRY.timed("stats.build_games_data")
+def build_games_data(game_data):
+    # Start from the store's cached round view; "Guess History" is already a readable string
+    games_data = game_data.frame().rename(columns={
+        "Round": "Round Number",
+        "Guesses": "Nb of Guesses",
+        "Non-Capitals": "Non-Capitals Named",
+        "Distance Off": "Distance Off (km)",
+    })
+    games_data = games_data.drop(columns=["Target Country"], errors="ignore")
+
+    # Create "Round Description" from the target capital
+    games_data["Round Description"] = games_data["Target Capital"].astype(str)
+
+    # Align indices with round numbers
+    games_data.index = games_data.index + 1
+    return games_data
+
+# Reuses the table across reruns; it is only rebuilt when a round has been added
+def get_games_data():
+    game_data = st.session_state.game_data
+    cached = st.session_state.get("games_data_view")
+    if cached is None or cached[0] != len(game_data):
+        cached = (len(game_data), build_games_data(game_data))
+        st.session_state.games_data_view = cached
+    return cached[1]
+
 # --- STATS PAGE FUNCTION ---
 def stats_page():
     st.title("📊 Game Stats")
 
     # Check if game data exists
-    if "game_data" in st.session_state and st.session_state.game_data:
-        # Convert game data to a DataFrame
-        games_data = pd.DataFrame(st.session_state.game_data)
-
-        # Clean and rename columns for clarity
-        games_data.rename(columns={
-            "Round": "Round Number",
-            "Guesses": "Nb of Guesses",
-            "Non-Capitals": "Non-Capitals Named",
-            "Distance Off": "Distance Off (km)",
-            "Guess History": "Guess History",
-        }, inplace=True)
-        games_data.drop(columns=["Target Country"], inplace=True, errors="ignore")
-
-        # Create "Round Description" as "Reference City - Target Capital"
-        if "Reference City" in games_data.columns:
-            games_data["Round Description"] = games_data["Reference City"] + " - " + games_data["Target Capital"]
-        else:
-            games_data["Round Description"] = games_data["Target Capital"]
-
-        # Format "Guess History" as a readable string
-        games_data["Guess History"] = games_data["Guess History"].apply(
-            lambda x: ", ".join([entry["Guess"] for entry in x])
-        )
-
-        # Align indices with round numbers
-        games_data.index = games_data.index + 1
-
-        # Calculate statistics for metrics
-        avg_guesses_current = games_data["Nb of Guesses"].mean()
+    initialize_state(st.session_state)
+    remember_player()
+    if st.session_state.game_data:
+        games_data = get_games_data()
+        round_stats = st.session_state.round_stats
+
+        # Calculate statistics for metrics from the running aggregates
+        avg_guesses_current = round_stats["Guesses"].mean
         delta_guesses = avg_guesses_current - st.session_state.average_guesses_previous
 
-        avg_distance_current = games_data["Distance Off (km)"].mean()
+        avg_distance_current = round_stats["Distance Off"].mean
         delta_distance = avg_distance_current - st.session_state.average_far_off
 
-        total_non_capitals_current = games_data["Non-Capitals Named"].sum()
+        total_non_capitals_current = round_stats["Non-Capitals"].total
         delta_non_capitals = total_non_capitals_current - st.session_state.total_non_capitals
 
         # Update session state
@@ -60,25 +73,26 @@ def stats_page():
 
         st.title("How did you do? Let's review your stats.")
 
-        #Bar Chart 1: number of guesses per round
-        st.bar_chart(
-            data=games_data,
-            x="Round Description",
-            y="Nb of Guesses",
-            x_label="Cities",
-            y_label="Number of Guesses",
-            use_container_width=False
-        )
-
-        #Bar Chart 2: distance off per round
-        st.bar_chart(
-            data=games_data,
-            x="Round Description",
-            y="Distance Off (km)",
-            x_label="Cities",
-            y_label="Distance off in km / round",
-            use_container_width=False
-        )
+        with TELEMETRY.span("stats.charts"):
+            #Bar Chart 1: number of guesses per round
+            st.bar_chart(
+                data=games_data,
+                x="Round Description",
+                y="Nb of Guesses",
+                x_label="Cities",
+                y_label="Number of Guesses",
+                use_container_width=False
+            )
+
+            #Bar Chart 2: distance off per round
+            st.bar_chart(
+                data=games_data,
+                x="Round Description",
+                y="Distance Off (km)",
+                x_label="Cities",
+                y_label="Distance off in km / round",
+                use_container_width=False
+            )
 
          # --- QUALITY METRICS ---
 
@@ -94,7 +108,7 @@ def stats_page():
         # Display detailed round data table
         st.write("### Detailed Round Data")
         st.dataframe(
-            games_data.drop(columns=["Round Number", "Round Description"], axis=1, errors="ignore"),
+            games_data.drop(columns=["Round Number", "Round Description"], errors="ignore"),
             use_container_width=True,
         )
 
@@ -102,5 +116,38 @@ def stats_page():
         # Display message if no game data is available
         st.warning("No game data available yet! Play a round to start tracking your stats.")
 
+    all_time_stats()
+
+# --- ALL-TIME STATS ---
+# Reads from the durable stats store's pre-aggregated tables; cached briefly to keep reruns cheap
+@st.cache_data(ttl=15)
+def load_player_history(player_id):
+    history_db = get_history_db()
+    return history_db.player_summary(player_id), history_db.player_trend(player_id)
+
+@st.cache_data(ttl=15)
+def load_leaderboard():
+    return get_history_db().leaderboard()
+
+@TELEMETRY.timed("stats.all_time_stats")
+def all_time_stats():
+    offer_resume()
+    summary, trend = load_player_history(st.session_state.player_id)
+    if summary:
+        st.write("### All your sessions")
+        st.caption("Your sessions are linked through the player id in this page's address; bookmark it to keep adding to these stats.")
+        columns = st.columns(len(summary))
+        for column, (label, value) in zip(columns, summary.items()):
+            column.metric(label, f"{value:.2f}" if isinstance(value, float) else value)
+        if len(trend) > 1:
+            st.line_chart(trend, x="Day", y="Avg Guesses", x_label="Day", y_label="Avg Guesses")
+
+    leaderboard = load_leaderboard()
+    if leaderboard:
+        st.write("### Global Leaderboard")
+        st.caption(f"Fewest guesses per round, among players with at least {LEADERBOARD_MIN_ROUNDS} rounds.")
+        st.dataframe([{"Rank": rank, **row} for rank, row in enumerate(leaderboard, start=1)], use_container_width=True, hide_index=True)
+
 # Call the stats page function
 stats_page()
+TELEMETRY.observe("stats.rerun", time.perf_counter() - rerun_started)
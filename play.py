@@ -1,6 +1,12 @@
+import time
 import streamlit as st
-import pandas as pd
-from assets.utils import fetch_capitals, evaluate_guess, update_game_data, display_hint
+from assets.utils import get_round_pool, stream_guess_evaluation, update_game_data, display_hint, remember_player, offer_resume, start_telemetry_export
+from assets.engine import initialize_state, begin_round, record_guess, CORRECT, NO_DISTANCE
+from assets.gazetteer import looks_like_place_name
+from assets.telemetry import TELEMETRY
+
+# Start of this script run, for the rerun latency span recorded at the bottom of the page
+rerun_started = time.perf_counter()
 
 # --- PAGE CONFIGURATION ---
 # Configure the Streamlit page with title, icon, and layout
@@ -9,50 +15,29 @@ st.set_page_config(page_title="Guess the Capital", page_icon="assets/favicon.png
 # --- INITIALIZE SESSION STATE ---
 # Initialize session state variables with default values to track game progress and statistics
 def initialize_session_state():
-    defaults = {
-        "game_data": [],  # Stores data for all completed rounds
-        "total_guesses": 0,  # Total guesses across all rounds
-        "total_non_capitals": 0,  # Total non-capitals guessed
-        "total_distance_off": 0,  # Cumulative distance off from correct answers
-        "start_playing_clicked": False,  # Indicates if the game has started
-        "round_number": 1,  # Current round number
-        "current_round": None,  # Data for the ongoing round
-        "guesses_this_round": 0,  # Guesses made in the current round
-        "non_capitals_this_round": 0,  # Non-capitals guessed in the current round
-        "distance_off_this_round": 0,  # Distance off in the current round
-        "guess_history": [],  # Stores guesses and outcomes for the current round
-        "hints": [],  # Hints for the current round
-        "hint_index": 0,  # Tracks which hint to show next
-        "round_complete": False,  # Indicates if the round is complete
-        "play_again_triggered": False,  # Tracks if "play again" was clicked
-        "round_index": 0,  # Tracks round order programmatically
-        "average_guesses_previous": 0,  # Avg guesses from previous rounds
-        "average_guesses_current": 0,  # Current avg guesses
-        "delta_guesses": 0,  # Change in avg guesses
-        "average_far_off": 0,  # Avg distance off from target
-    }
-    for key, value in defaults.items():
-        if key not in st.session_state:
-            st.session_state[key] = value
+    initialize_state(st.session_state)
+    remember_player()
 
 initialize_session_state()
 
+# --- ROUND POOL ---
+# One pool of prefetched rounds per server process, shared by all sessions (see get_round_pool)
+round_pool = get_round_pool()
+start_telemetry_export()
+
 # --- START NEW ROUND ---
-# Prepares a new round by resetting relevant state variables and fetching new data
+# Prepares a new round by resetting relevant state variables and taking a prefetched round.
+# Returns False (after showing an error) if no round was ready.
+@TELEMETRY.timed("play.start_new_round")
 def start_new_round():
     with st.spinner("Preparing a new round..."):
+        next_round = round_pool.take()
+        if next_round is None:
+            st.error("We are experiencing a server issue, please try again.")
+            return False
         update_game_data()  # Save completed round data
-        st.session_state.current_round = fetch_capitals()  # Fetch new round details
-        st.session_state.guesses_this_round = 0
-        st.session_state.non_capitals_this_round = 0
-        st.session_state.distance_off_this_round = 0
-        st.session_state.guess_history = []
-        st.session_state.round_complete = False
-        st.session_state.hint_index = 0
-        st.session_state.play_again_triggered = False
-        st.session_state.round_index += 1  # Increment round index for tracking
-        target = st.session_state.current_round["guess_capital"]
-        st.session_state.hints = target["fun_facts"] + [f"It is in {target['country']}"]
+        begin_round(st.session_state, next_round)  # Reset round state for the new round
+        return True
 
 # --- START PLAYING BUTTON LOGIC ---
 # Starts the game when the "Start Playing" button is clicked
@@ -61,78 +46,44 @@ def start_playing():
         st.session_state.start_playing_clicked = True
         start_new_round()
 
+# --- EVALUATION ERRORS ---
+# Requests turned away by the rate limiter are not counted as guesses, so the player can simply resubmit
+def show_evaluation_error(evaluation):
+    if evaluation.get("busy"):
+        st.warning("Lots of players right now! Please submit your guess again in a moment.")
+    else:
+        st.error("We are experiencing a server issue, please try again.")
+
 # --- EVALUATE GUESS ---
-# Evaluates the player's guess, updates stats, and provides feedback
+# Evaluates the player's guess, updates stats, and provides feedback.
+# The verdict is shown as soon as it streams in and the comment is streamed into the page.
 def evaluate_guess_and_provide_feedback(guess):
-    with st.spinner("Evaluating your guess..."):
-        evaluation = evaluate_guess(st.session_state.current_round, guess.upper())
-        st.session_state.guesses_this_round += 1
-        st.session_state.total_guesses += 1
-
-        # Handle invalid city or incorrect guess
-        if not evaluation["is_capital"] or not evaluation["valid_city"]:
-            st.error("Try again!")
-            st.session_state.non_capitals_this_round += 1
-            st.session_state.total_non_capitals += 1
-            st.session_state.total_distance_off += 0
-        else:
-            # Valid city but incorrect guess
-            if not evaluation["guess_correct"]:
-                distance = evaluation.get("distance_to_guess", "N/A")
-                if isinstance(distance, (int, float)):
-                    st.session_state.distance_off_this_round += distance
-                    st.session_state.total_distance_off += distance
-                    st.error("Try again!")
-                else:
-                    st.warning("Distance could not be calculated.")
-            else:
-                # Correct guess
-                st.session_state.guess_history.append({
-                    "Guess": guess,
-                    "Correct": evaluation["guess_correct"],
-                    "Distance": evaluation.get("distance_to_guess", "N/A"),
-                    "Capital": evaluation["is_capital"],
-                    "Comment": evaluation["comment"]
-
-                })
-                update_realtime_stats()
-                st.success("Congrats! That's correct.")
-                st.session_state.round_complete = True
-                st.rerun()
-
-
-        # Add guess details to guess history
-        st.session_state.guess_history.append({
-            "Guess": guess,
-            "Correct": evaluation["guess_correct"],
-            "Distance": evaluation.get("distance_to_guess", "N/A"),
-            "Capital": evaluation["is_capital"],
-            "Comment": evaluation["comment"]
-        })
-
-        # Update stats and provide next hint or end round
-        update_realtime_stats()
-        if not evaluation["guess_correct"]:
-            display_hint()
-
-        # Move to the next round if completed
-        if st.session_state.round_complete:
-            st.session_state.round_number += 1
-
-# --- UPDATE REAL-TIME STATS ---
-# Updates session statistics dynamically during the game
-def update_realtime_stats():
-    st.session_state.average_guesses_previous = st.session_state.average_guesses_current
-    if st.session_state.game_data:
-        st.session_state.average_guesses_current = pd.DataFrame(st.session_state.game_data)["Guesses"].mean()
+    with st.spinner("Evaluating your guess..."), TELEMETRY.span("play.time_to_verdict"):
+        stream = stream_guess_evaluation(st.session_state.current_round, guess.upper())
+        verdict = stream.wait_for_verdict()
+
+    if "error" in verdict:
+        show_evaluation_error(verdict)
+        return
+    if verdict["guess_correct"]:
+        st.success("Congrats! That's correct.")
     else:
-        st.session_state.average_guesses_current = st.session_state.guesses_this_round
-    st.session_state.delta_guesses = st.session_state.average_guesses_current - st.session_state.average_guesses_previous
+        st.error("Try again!")
+    st.write_stream(stream.comment_chunks())
 
-    if st.session_state.game_data:
-        st.session_state.average_far_off = pd.DataFrame(st.session_state.game_data)["Distance Off"].mean()
-    else:
-        st.session_state.average_far_off = st.session_state.distance_off_this_round
+    evaluation = stream.result()
+    if "error" in evaluation:
+        show_evaluation_error(evaluation)
+        return
+    outcome = record_guess(st.session_state, guess, evaluation)
+
+    if outcome == CORRECT:
+        st.rerun()
+    elif outcome == NO_DISTANCE:
+        st.warning("Distance could not be calculated.")
+
+    # Provide the next hint
+    display_hint()
 
 # --- DISPLAY TRACKING VARIABLES ---
 # Displays key game statistics for the current session - for debugging
@@ -155,6 +106,9 @@ def display_tracking_variables():
 if not st.session_state.start_playing_clicked:
     st.title("Welcome to Guess the Capital!")
     st.write("Try to guess the capital x km away from the city we give you!")
+    offer_resume()
+    player_name = st.text_input("Your name for the leaderboard (optional):", value=st.session_state.player_name)
+    st.session_state.player_name = player_name.strip()[:30]
     st.button("Start Playing", on_click=start_playing)
 else:
     if st.session_state.round_complete:
@@ -163,11 +117,13 @@ else:
         st.write(f"Non-Capitals Named: {st.session_state.non_capitals_this_round}")
         st.write(f"Distance Off This Round: {st.session_state.distance_off_this_round}")
         st.write("Guess History:")
-        st.write(pd.DataFrame(st.session_state.guess_history))
-        st.write(f"Comment: {st.session_state.guess_history[-1]["Comment"]}")
-        if st.button("Play Again and Update Stats"):
-            start_new_round()
+        st.dataframe(st.session_state.guess_history)
+        st.write(f"Comment: {st.session_state.guess_history[-1]['Comment']}")
+        # Only rerun once a round has started, so a failure message stays on screen
+        if st.button("Play Again and Update Stats") and start_new_round():
             st.rerun()
+    elif st.session_state.current_round is None:
+        st.button("Try Again", on_click=start_new_round)
     else:
         current_data = st.session_state.current_round
         reference_city = current_data["target_capital"]["name"]
@@ -177,7 +133,7 @@ else:
         user_guess = st.text_input("Enter your guess:").strip()
 
         if st.button("Submit"):
-            if user_guess and not user_guess.replace(" ", "").isalpha():
+            if user_guess and not looks_like_place_name(user_guess):
                 st.error("Invalid guess. Please enter a valid word.")
             elif not user_guess:
                 st.warning("Guess cannot be empty.")
@@ -194,3 +150,6 @@ else:
 # if st.session_state.start_playing_clicked and st.session_state.current_round:
 #     st.write("### Current Round Data")
 #     st.json(st.session_state.current_round)
+
+# Reruns that end in st.rerun() stop before this line and are not counted
+TELEMETRY.observe("play.rerun", time.perf_counter() - rerun_started)
@@ -0,0 +1,198 @@
+"""
+The request dispatcher: coalescing of identical requests, retries with backoff,
+the typed errors for refused and failed requests, and streaming (including a
+leader that abandons its stream).
+
+Run from the repository root with python -m pytest.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from assets.dispatcher import Dispatcher, DispatchError, OverloadedError, RateLimitedError, UpstreamError
+
+
+class Transient(Exception):
+    pass
+
+
+class TooManyRequests(Exception):
+    pass
+
+
+def fast_dispatcher(**settings):
+    # Short waits and backoff so failing paths finish quickly
+    options = {"max_wait": 0.2, "base_delay": 0.001, "max_delay": 0.01,
+               "is_retryable": lambda error: isinstance(error, (Transient, TooManyRequests)),
+               "is_rate_limit": lambda error: isinstance(error, TooManyRequests)}
+    options.update(settings)
+    return Dispatcher(**options)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+class Flaky:
+    # Raises the given errors in turn, then returns `result`
+    def __init__(self, errors, result="ok"):
+        self.errors = list(errors)
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return self.result
+
+
+# --- Coalescing ---
+
+def test_overlapping_calls_with_the_same_key_share_one_request():
+    dispatcher = fast_dispatcher()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(5)
+        return {"answer": [1, 2]}
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        leader = executor.submit(dispatcher.call, slow, key="same")
+        wait_until(lambda: calls)
+        follower = executor.submit(dispatcher.call, slow, key="same")
+        wait_until(lambda: dispatcher.metrics()["coalesced"] == 1)
+        release.set()
+        leader_result, follower_result = leader.result(), follower.result()
+
+    assert len(calls) == 1
+    assert follower_result == leader_result == {"answer": [1, 2]}
+    assert follower_result is not leader_result  # Followers get a copy they may modify
+    assert dispatcher.metrics()["in_flight"] == 0
+
+
+def test_calls_without_a_key_are_not_coalesced():
+    dispatcher = fast_dispatcher()
+    func = Flaky([])
+    dispatcher.call(func)
+    dispatcher.call(func)
+    assert func.calls == 2 and dispatcher.metrics()["coalesced"] == 0
+
+
+# --- Retries ---
+
+def test_retryable_failures_are_retried():
+    dispatcher = fast_dispatcher()
+    func = Flaky([Transient("reset"), Transient("reset")])
+    assert dispatcher.call(func) == "ok"
+    assert func.calls == 3 and dispatcher.metrics()["retries"] == 2
+
+
+def test_other_failures_are_not_retried():
+    dispatcher = fast_dispatcher()
+    func = Flaky([ValueError("bad request")])
+    with pytest.raises(UpstreamError) as raised:
+        dispatcher.call(func)
+    assert func.calls == 1
+    assert isinstance(raised.value.__cause__, ValueError)
+    assert raised.value.busy is False
+
+
+def test_retries_stop_after_max_retries():
+    dispatcher = fast_dispatcher(max_retries=2)
+    func = Flaky([Transient("reset")] * 5)
+    with pytest.raises(UpstreamError):
+        dispatcher.call(func)
+    assert func.calls == 3 and dispatcher.metrics()["failures"] == 1
+
+
+# --- Typed errors ---
+
+def test_persistent_429s_are_rate_limited_errors():
+    dispatcher = fast_dispatcher(max_retries=1)
+    with pytest.raises(RateLimitedError) as raised:
+        dispatcher.call(Flaky([TooManyRequests("429")] * 2))
+    assert raised.value.busy is True
+
+
+def test_an_empty_token_bucket_is_a_rate_limited_error():
+    dispatcher = fast_dispatcher(rate_per_second=0.01, burst=1, max_wait=0.05)
+    assert dispatcher.call(Flaky([])) == "ok"
+    with pytest.raises(RateLimitedError):
+        dispatcher.call(Flaky([]))
+    assert dispatcher.metrics()["rate_limited"] == 1
+
+
+def test_taken_slots_are_an_overloaded_error():
+    dispatcher = fast_dispatcher(max_concurrency=1, max_wait=0.05)
+    release = threading.Event()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "ok"
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        holder = executor.submit(dispatcher.call, slow)
+        started.wait(5)
+        with pytest.raises(OverloadedError) as raised:
+            dispatcher.call(Flaky([]))
+        release.set()
+        assert holder.result() == "ok"
+    assert raised.value.busy is True and isinstance(raised.value, DispatchError)
+    assert dispatcher.metrics()["overloaded"] == 1
+
+
+# --- Streaming ---
+
+def test_stream_retries_failures_before_the_first_chunk():
+    dispatcher = fast_dispatcher()
+    func = Flaky([Transient("reset")], result=["a", "b", "c"])
+    assert list(dispatcher.stream(func)) == ["a", "b", "c"]
+    assert func.calls == 2
+
+
+def test_stream_failure_after_the_first_chunk_is_an_upstream_error():
+    def chunks():
+        yield "a"
+        raise Transient("reset")
+
+    dispatcher = fast_dispatcher()
+    stream = dispatcher.stream(chunks)
+    assert next(stream) == "a"
+    with pytest.raises(UpstreamError):
+        next(stream)
+
+
+def test_stream_followers_get_the_whole_text():
+    dispatcher = fast_dispatcher()
+    leader = dispatcher.stream(lambda: iter(["Hel", "lo"]), key="same")
+    assert next(leader) == "Hel"
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        follower = executor.submit(lambda: list(dispatcher.stream(lambda: iter(["unused"]), key="same")))
+        wait_until(lambda: dispatcher.metrics()["coalesced"] == 1)
+        assert list(leader) == ["lo"]
+        assert follower.result(timeout=5) == ["Hello"]
+
+
+def test_followers_of_an_abandoned_stream_get_an_upstream_error():
+    dispatcher = fast_dispatcher(max_concurrency=1)
+    leader = dispatcher.stream(lambda: iter(["Hel", "lo"]), key="same")
+    assert next(leader) == "Hel"
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        follower = executor.submit(lambda: list(dispatcher.stream(lambda: iter(["unused"]), key="same")))
+        wait_until(lambda: dispatcher.metrics()["coalesced"] == 1)
+        leader.close()
+        with pytest.raises(UpstreamError, match="abandoned"):
+            follower.result(timeout=5)
+    # The abandoned stream gave its slot back
+    assert dispatcher.call(Flaky([])) == "ok"
+    assert dispatcher.metrics()["in_flight"] == 0
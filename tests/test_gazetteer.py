@@ -0,0 +1,84 @@
+"""
+Local guess resolution: Gazetteer.resolve on aliases, diacritics, typos at each
+max_typos threshold, capital tie-breaking and the trigram candidate bound.
+
+Run from the repository root with python -m pytest.
+"""
+from assets import name_index
+from assets.gazetteer import Gazetteer, load_gazetteer, max_typos
+
+
+def resolved_name(guess):
+    gazetteer = load_gazetteer()
+    i = gazetteer.resolve(guess)
+    return None if i is None else gazetteer.names[i]
+
+
+# --- Exact names and aliases ---
+
+def test_aliases_resolve_to_the_current_name():
+    assert resolved_name("Kiev") == "Kyiv"
+    assert resolved_name("Peking") == "Beijing"
+
+
+def test_diacritics_and_case_are_ignored():
+    assert resolved_name("Bogota") == "Bogotá"
+    assert resolved_name("  bogotá ") == "Bogotá"
+
+
+# --- Typos ---
+
+def test_max_typos_grows_with_the_name_length():
+    assert [max_typos("x" * n) for n in (6, 7, 8, 9)] == [0, 1, 1, 2]
+
+
+def test_short_names_must_match_exactly():
+    assert resolved_name("Vienne") is None  # A real city one edit away from Vienna
+    assert resolved_name("Berlni") is None
+
+
+def test_typos_within_the_threshold_are_corrected():
+    assert resolved_name("Naiorbi") == "Nairobi"  # 7 letters, one swap
+    assert resolved_name("Kinshasha") == "Kinshasa"  # 9 letters, one insertion
+    assert resolved_name("Ouagadougo") == "Ouagadougou"  # 10 letters, one deletion
+
+
+def test_unknown_names_are_left_to_the_model():
+    assert resolved_name("Atlantis") is None
+
+
+# --- Tie-breaking ---
+
+def small_gazetteer(names, is_capital):
+    count = len(names)
+    return Gazetteer(names, ["Somewhere"] * count, [0.0] * count, [0.0] * count, is_capital)
+
+
+def test_a_single_capital_wins_a_tie():
+    gazetteer = small_gazetteer(["Marlowe", "Marlows"], [False, True])
+    assert gazetteer.names[gazetteer.resolve("Marlowz")] == "Marlows"
+
+
+def test_ties_between_capitals_are_ambiguous():
+    gazetteer = small_gazetteer(["Marlowe", "Marlows"], [True, True])
+    assert gazetteer.resolve("Marlowz") is None
+
+
+def test_the_closest_match_wins_over_capitals_further_away():
+    gazetteer = small_gazetteer(["Castellano", "Castellina"], [False, True])
+    assert gazetteer.names[gazetteer.resolve("Castellanoo")] == "Castellano"
+
+
+# --- Candidate bound ---
+
+def test_repetitive_input_checks_no_candidates(monkeypatch):
+    load_gazetteer().resolve("Kinshasha")  # Build the trigram index first
+    calls = []
+
+    def counting_edit_distance(a, b, max_distance):
+        calls.append(b)
+        return max_distance + 1
+
+    monkeypatch.setattr(name_index, "edit_distance", counting_edit_distance)
+    assert resolved_name("z" * 30) is None
+    assert calls == []
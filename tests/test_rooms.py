@@ -0,0 +1,192 @@
+"""
+Multiplayer rooms: RoomEngine driven by a stubbed round source and evaluator,
+covering dealing, guesses, joining, capacity, archiving and the host role.
+
+Run from the repository root with python -m pytest.
+"""
+import threading
+import time
+
+import pytest
+
+from assets.engine import CORRECT, INCORRECT
+from assets.rooms import RoomEngine, RoomError
+
+
+def make_round(number):
+    return {
+        "target_capital": {"name": f"Reference {number}", "country": "Somewhere"},
+        "guess_capital": {"name": f"Answer {number}", "country": "Elsewhere", "fun_facts": ["it is a city."]},
+        "distance_km": 1000 + number,
+    }
+
+
+class StubRounds:
+    # Numbered rounds, counting how often one was fetched
+    def __init__(self):
+        self.fetched = 0
+
+    def __call__(self):
+        self.fetched += 1
+        return make_round(self.fetched)
+
+
+def stub_evaluate(round_data, guess):
+    correct = guess.upper() == round_data["guess_capital"]["name"].upper()
+    return {"guess_correct": correct, "is_capital": True, "valid_city": True,
+            "distance_to_guess": 0 if correct else 500, "comment": "Stub comment."}
+
+
+def make_engine(**settings):
+    rounds = StubRounds()
+    archived = []
+    engine = RoomEngine(rounds, stub_evaluate, on_round_complete=lambda *args: archived.append(args), **settings)
+    return engine, rounds, archived
+
+
+def answer(engine, code, player_id):
+    return engine.player_state(code, player_id)["current_round"]["guess_capital"]["name"]
+
+
+# --- Dealing and guessing ---
+
+def test_one_round_is_fetched_and_dealt_to_every_player():
+    engine, rounds, _ = make_engine()
+    code = engine.create_room("host", "Ann")
+    engine.join(code, "guest", "Bob")
+    assert engine.start_round(code, "host")
+    assert rounds.fetched == 1
+    assert engine.player_state(code, "host")["current_round"] is engine.player_state(code, "guest")["current_round"]
+
+
+def test_only_the_host_starts_rounds():
+    engine, _, _ = make_engine()
+    code = engine.create_room("host")
+    engine.join(code, "guest")
+    with pytest.raises(RoomError):
+        engine.start_round(code, "guest")
+
+
+def test_guesses_are_recorded_per_player():
+    engine, _, _ = make_engine()
+    code = engine.create_room("host")
+    engine.join(code, "guest")
+    engine.start_round(code, "host")
+    assert engine.submit_guess(code, "guest", "Nowhere")["outcome"] == INCORRECT
+    result = engine.submit_guess(code, "guest", answer(engine, code, "guest"))
+    assert result["outcome"] == CORRECT and result["hint"] is None
+    assert engine.player_state(code, "guest")["round_complete"]
+    assert not engine.player_state(code, "host")["round_complete"]
+    # A solved round takes no more guesses
+    assert engine.submit_guess(code, "guest", "Nowhere") is None
+
+
+def test_a_guess_evaluated_across_a_new_round_is_dropped():
+    evaluating = threading.Event()
+    release = threading.Event()
+
+    def slow_evaluate(round_data, guess):
+        evaluating.set()
+        release.wait(5)
+        return stub_evaluate(round_data, guess)
+
+    engine = RoomEngine(StubRounds(), slow_evaluate)
+    code = engine.create_room("host")
+    engine.start_round(code, "host")
+    results = []
+    guess = threading.Thread(target=lambda: results.append(engine.submit_guess(code, "host", "Nowhere")))
+    guess.start()
+    assert evaluating.wait(5)
+    engine.start_round(code, "host")
+    release.set()
+    guess.join(5)
+    assert results == [None]
+    assert engine.player_state(code, "host")["guesses_this_round"] == 0
+
+
+# --- Joining ---
+
+def test_joining_during_a_round_deals_the_current_round():
+    engine, rounds, _ = make_engine()
+    code = engine.create_room("host")
+    engine.start_round(code, "host")
+    engine.join(code.lower(), "late")
+    assert engine.player_state(code, "late")["current_round"] is engine.player_state(code, "host")["current_round"]
+    assert rounds.fetched == 1
+
+
+def test_rooms_are_capped_at_max_players():
+    engine, _, _ = make_engine(max_players=2)
+    code = engine.create_room("host")
+    engine.join(code, "guest")
+    with pytest.raises(RoomError, match="full"):
+        engine.join(code, "third")
+    engine.join(code, "guest", "Renamed")  # Joining again is not a new player
+    assert engine.metrics() == {"rooms": 1, "players": 2}
+
+
+def test_unknown_rooms_raise():
+    engine, _, _ = make_engine()
+    with pytest.raises(RoomError):
+        engine.join("NOPE1", "guest")
+
+
+# --- Archiving ---
+
+def test_solved_rounds_are_archived_when_the_next_round_starts():
+    engine, _, archived = make_engine()
+    code = engine.create_room("host", "Ann", history_id="ann-stats")
+    engine.join(code, "guest", "Bob")
+    engine.start_round(code, "host")
+    engine.submit_guess(code, "host", answer(engine, code, "host"))
+    assert archived == []
+    engine.start_round(code, "host")
+    assert len(archived) == 1  # Bob had not solved the round
+    history_id, player_name, round_record = archived[0]
+    assert (history_id, player_name) == ("ann-stats", "Ann")
+    assert round_record["Guesses"] == 1 and round_record["Reference City"] == "Reference 1"
+
+
+# --- Host role and closing ---
+
+def test_the_host_role_passes_on_when_the_host_leaves():
+    engine, _, _ = make_engine()
+    code = engine.create_room("host")
+    engine.join(code, "guest")
+    engine.leave(code, "host")
+    assert engine.get(code).host_id == "guest"
+    assert engine.start_round(code, "guest")
+
+
+def test_the_host_role_passes_on_when_the_host_goes_quiet():
+    engine, _, _ = make_engine(host_timeout=0.05)
+    code = engine.create_room("host")
+    engine.join(code, "guest")
+    engine.touch(code, "guest")
+    assert engine.get(code).host_id == "host"
+    time.sleep(0.1)
+    engine.touch(code, "guest")
+    assert engine.get(code).host_id == "guest"
+
+
+def test_the_last_player_out_closes_the_room(monkeypatch):
+    engine, _, _ = make_engine()
+    code = engine.create_room("host")
+    room = engine.get(code)
+    engine.leave(code, "host")
+    assert engine.metrics()["rooms"] == 0
+    with pytest.raises(RoomError):
+        engine.get(code)
+    # A join that looked the room up before it closed does not reopen it
+    monkeypatch.setattr(engine, "get", lambda code: room)
+    with pytest.raises(RoomError):
+        engine.join(code, "late")
+
+
+def test_idle_rooms_are_dropped_on_lookup():
+    engine, _, _ = make_engine(idle_timeout=0.05)
+    idle = engine.create_room("host")
+    time.sleep(0.1)
+    with pytest.raises(RoomError):
+        engine.get(idle)
+    assert engine.metrics()["rooms"] == 0
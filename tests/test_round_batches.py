@@ -0,0 +1,168 @@
+"""
+Batched round fetching: parse_round_batch, the OpenAI backend's batch request
+(against a stubbed client) and the RoundPool fed by a stubbed fetcher.
+
+Run from the repository root with python -m pytest.
+"""
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from assets.backends import OpenAIBackend, parse_round_batch
+from assets.dispatcher import Dispatcher
+from assets.round_pool import RoundPool
+
+
+def make_round(name, country="Somewhere"):
+    return {
+        "target_capital": {"name": "Tunis", "country": "Tunisia"},
+        "guess_capital": {"name": name, "country": country, "fun_facts": ["it is a city."]},
+        "distance_km": 1000,
+    }
+
+
+MIXED_BATCH = [
+    make_round("Rome", "Italy"),
+    {"target_capital": {"name": "Tunis", "country": "Tunisia"}},  # No guess capital
+    make_round("Oslo", "Norway"),
+    dict(make_round("Lima", "Peru"), distance_km="far"),  # Distance is not a number
+    dict(make_round("Bern", "Switzerland"), distance_km=True),  # Booleans are not distances
+    "not a round",
+    make_round("Quito", "Ecuador"),
+]
+
+
+def guess_names(rounds):
+    return [round_data["guess_capital"]["name"] for round_data in rounds]
+
+
+# --- parse_round_batch ---
+
+def test_parse_round_batch_keeps_only_valid_entries():
+    assert guess_names(parse_round_batch(json.dumps(MIXED_BATCH))) == ["Rome", "Oslo", "Quito"]
+
+
+def test_parse_round_batch_unwraps_an_object():
+    assert guess_names(parse_round_batch(json.dumps({"rounds": MIXED_BATCH}))) == ["Rome", "Oslo", "Quito"]
+
+
+def test_parse_round_batch_accepts_a_single_round_object():
+    assert guess_names(parse_round_batch(json.dumps(make_round("Rome", "Italy")))) == ["Rome"]
+
+
+def test_parse_round_batch_rejects_malformed_output():
+    assert parse_round_batch("[{\"target_capital\": ") == []
+    assert parse_round_batch("42") == []
+    assert parse_round_batch(json.dumps({"rounds": "none"})) == []
+
+
+# --- OpenAIBackend.fetch_rounds ---
+
+class StubCompletions:
+    # Stands in for client.chat.completions, answering every request with `content`
+    def __init__(self, content):
+        self.content = content
+        self.requests = []
+
+    def create(self, **request):
+        self.requests.append(request)
+        message = SimpleNamespace(content=self.content)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+def stub_backend(content):
+    # Skips __init__, which would build a real OpenAI client
+    backend = OpenAIBackend.__new__(OpenAIBackend)
+    backend.model = "gpt-3.5-turbo"
+    completions = StubCompletions(content)
+    backend.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    backend.dispatcher = Dispatcher()
+    return backend, completions
+
+
+def test_fetch_rounds_asks_for_the_whole_batch_in_one_request():
+    backend, completions = stub_backend(json.dumps({"rounds": MIXED_BATCH}))
+    assert guess_names(backend.fetch_rounds(7)) == ["Rome", "Oslo", "Quito"]
+    assert len(completions.requests) == 1
+    assert "JSON array of 7 objects" in completions.requests[0]["messages"][1]["content"]
+
+
+def test_fetch_rounds_uses_the_single_round_prompt_for_one_round():
+    backend, completions = stub_backend(json.dumps(make_round("Rome", "Italy")))
+    assert guess_names(backend.fetch_rounds(1)) == ["Rome"]
+    assert "JSON object" in completions.requests[0]["messages"][1]["content"]
+
+
+# --- RoundPool ---
+
+class StubFetcher:
+    # Returns batches of numbered rounds, with every third one malformed
+    def __init__(self, fail_first=0):
+        self.counts = []
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def __call__(self, count):
+        with self._lock:
+            self.counts.append(count)
+            if len(self.counts) <= self.fail_first:
+                raise RuntimeError("upstream failed")
+            rounds = []
+            for _ in range(count):
+                self._next += 1
+                rounds.append({"broken": True} if self._next % 3 == 0 else make_round(f"City {self._next}"))
+            return parse_round_batch(json.dumps(rounds))
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_round_pool_fetches_in_batches_and_serves_valid_rounds():
+    fetcher = StubFetcher()
+    pool = RoundPool(fetcher, capacity=8, low_water=3, batch_size=4)
+    try:
+        pool.refill()
+        wait_until(lambda: pool.metrics()["in_flight"] == 0)
+        assert fetcher.counts == [4, 4]
+        metrics = pool.metrics()
+        # parse_round_batch already dropped the malformed entries of each batch
+        assert metrics["batches"] == 2 and metrics["fetched"] == metrics["depth"] == 6
+        served = [pool.take(timeout=1) for _ in range(6)]
+        assert all(round_data["guess_capital"]["name"].startswith("City") for round_data in served)
+        assert pool.metrics()["served"] == 6
+    finally:
+        pool.shutdown()
+
+
+def test_round_pool_rejects_rounds_that_fail_validation():
+    pool = RoundPool(lambda count: [make_round("Rome"), {"broken": True}][:count], validate=lambda data: "broken" not in data,
+                     capacity=2, low_water=1, batch_size=2)
+    try:
+        assert pool.take(timeout=2)["guess_capital"]["name"] == "Rome"
+        wait_until(lambda: pool.metrics()["rejected"] >= 1)
+    finally:
+        pool.shutdown()
+
+
+def test_round_pool_retries_failed_fetches_while_waiting():
+    fetcher = StubFetcher(fail_first=1)
+    pool = RoundPool(fetcher, capacity=1, low_water=1, batch_size=1)
+    try:
+        assert pool.take(timeout=5) is not None
+        assert pool.metrics()["errors"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_round_pool_take_returns_none_when_nothing_arrives():
+    pool = RoundPool(lambda count: [], capacity=1, low_water=1)
+    try:
+        assert pool.take(timeout=0.2) is None
+    finally:
+        pool.shutdown()
@@ -0,0 +1,81 @@
+"""
+Streamed guess evaluations: VerdictStreamParser and EvaluationStream on
+well-formed, malformed and truncated model output.
+
+Run from the repository root with python -m pytest.
+"""
+import json
+
+from assets.streaming import PARSE_ERROR, EvaluationStream, VerdictStreamParser
+
+
+def chunked(text, size=7):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def stream_of(text, on_complete=None):
+    return EvaluationStream(chunked(text), on_complete=on_complete, on_error=lambda e: {"error": str(e), "busy": False})
+
+
+VALID = json.dumps({
+    "guess_correct": False,
+    "is_capital": True,
+    "valid_city": True,
+    "distance_to_guess": 1200,
+    "comment": "Close, but \"no\" éclair for you.",
+})
+
+
+def test_verdict_comes_before_the_comment_is_complete():
+    stream = stream_of(VALID)
+    verdict = stream.wait_for_verdict()
+    assert verdict["guess_correct"] is False
+    assert "".join(stream.comment_chunks()) == "Close, but \"no\" éclair for you."
+    assert stream.result() == json.loads(VALID)
+
+
+def test_stream_without_a_boolean_verdict_is_an_error():
+    text = '{"guess_correct": "false", "is_capital": true, "valid_city": true, "distance_to_guess": 10, "comment": "hm"}'
+    stream = stream_of(text, on_complete=lambda result: result)
+    assert stream.wait_for_verdict() == PARSE_ERROR
+    assert stream.result() == PARSE_ERROR
+
+
+def test_raw_control_characters_in_the_comment_are_decoded():
+    text = '{"guess_correct": true, "is_capital": true, "valid_city": true, "distance_to_guess": 0, "comment": "Well\n\tdone!"}'
+    stream = stream_of(text)
+    assert stream.wait_for_verdict()["guess_correct"] is True
+    assert "".join(stream.comment_chunks()) == "Well\n\tdone!"
+    assert stream.result()["comment"] == "Well\n\tdone!"
+
+
+def test_invalid_escape_does_not_break_the_stream():
+    parser = VerdictStreamParser()
+    assert parser.feed('{"guess_correct": true, "comment": "a \\q b"') == "a \\q b"
+
+
+def test_truncated_stream_keeps_the_streamed_comment():
+    text = VALID[:-3]  # Cut inside the closing quote and brace
+    stream = stream_of(text)
+    stream.wait_for_verdict()
+    streamed = "".join(stream.comment_chunks())
+    result = stream.result()
+    assert "error" not in result
+    assert result["comment"] == streamed and streamed.startswith("Close, but")
+
+
+def test_truncated_stream_missing_verdict_fields_is_an_error():
+    completed = []
+    stream = stream_of('{"guess_correct": false, "comment": "Nope', on_complete=completed.append)
+    assert stream.wait_for_verdict() == {"guess_correct": False}
+    assert stream.result() == PARSE_ERROR
+    assert completed == []
+
+
+def test_failing_stream_goes_through_on_error():
+    def chunks():
+        yield '{"guess_'
+        raise RuntimeError("connection reset")
+
+    stream = EvaluationStream(chunks(), on_error=lambda e: {"error": str(e), "busy": False})
+    assert stream.wait_for_verdict() == {"error": "connection reset", "busy": False}